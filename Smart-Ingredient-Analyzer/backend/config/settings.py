@@ -13,6 +13,13 @@ class Settings(BaseSettings):
     # Groq API Configuration
     GROQ_API_KEY: str
     GROQ_MODEL: str = "llama-3.3-70b-versatile"
+    GROQ_JSON_MODE: bool = True  # Request response_format=json_object
+
+    # Model tiering: short context/chat requests go to the small model
+    GROQ_MODEL_SMALL: str = "llama-3.1-8b-instant"
+    GROQ_ROUTING_ENABLED: bool = True
+    GROQ_SMALL_MODEL_ROUTES: str = "context,chat"  # Comma-separated request classes
+    GROQ_SMALL_MODEL_MAX_CHARS: int = 1000
 
     # Server Configuration
     NODE_ENV: str = "development"
@@ -27,6 +34,74 @@ class Settings(BaseSettings):
     GROQ_TIMEOUT_NORMAL: int = 30000
     GROQ_TIMEOUT_MOBILE: int = 10000
 
+    # Hedged requests (mobile path, opt-in)
+    GROQ_HEDGING_ENABLED: bool = False
+    GROQ_HEDGE_MODEL: str = ""  # Backup attempt model; empty reuses the primary model
+    GROQ_HEDGE_DELAY_MS: int = 2500  # Used until enough latency samples exist
+    GROQ_HEDGE_MIN_SAMPLES: int = 20
+
+    # Circuit breaker around Groq calls
+    GROQ_BREAKER_FAILURE_RATIO: float = 0.5
+    GROQ_BREAKER_MIN_CALLS: int = 10
+    GROQ_BREAKER_WINDOW: int = 20
+    GROQ_BREAKER_SLOW_CALL_MS: int = 8000  # minimum; streams are judged on first byte
+    GROQ_BREAKER_SLOW_CALL_FRACTION: float = 0.8  # of a call's own timeout, for longer timeouts
+    GROQ_BREAKER_RESET_MS: int = 30000
+    GROQ_BREAKER_HALF_OPEN_PROBES: int = 2
+
+    # Chat memory token budgets
+    CHAT_HISTORY_TOKEN_BUDGET: int = 600
+    CHAT_SUMMARY_TOKEN_BUDGET: int = 150
+    CHAT_MESSAGE_TOKEN_LIMIT: int = 200
+
+    # Sessions
+    SESSION_BACKEND: str = "memory"  # memory | file
+    SESSION_FILE_DIR: str = ".sessions"
+    SESSION_TTL_SECONDS: int = 24 * 60 * 60
+    SWEEP_INTERVAL_SECONDS: int = 5 * 60  # how often expired sessions and cache entries are deleted
+
+    # WebSocket
+    WS_MAX_OPERATIONS: int = 8  # concurrent operations per connection
+
+    # Async jobs
+    JOB_WORKERS: int = 4
+    JOB_QUEUE_SIZE: int = 100
+    JOB_RESULT_TTL_SECONDS: int = 60 * 60
+    JOB_CALLBACK_TIMEOUT: float = 10.0
+
+    # Load shedding
+    LOAD_SHEDDING_ENABLED: bool = True
+    SHED_MAX_LAG_MS: int = 200
+    SHED_MAX_IN_FLIGHT: int = 64  # concurrent Groq/OCR operations
+    SHED_LOW_PRIORITY_FRACTION: float = 0.5
+    SHED_RETRY_AFTER_SECONDS: int = 2
+
+    # Response compression
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+
+    # HTTP caching of GET /api/analysis/{id}
+    ANALYSIS_HTTP_MAX_AGE: int = 300
+
+    # OCR
+    OCR_ENGINE: str = "auto"  # auto | tesserocr | pytesseract
+    OCR_WARMUP: bool = True  # load OCR in the background at startup instead of on first image
+    OCR_LANG: str = "eng"
+    OCR_TESSDATA_PATH: str = ""  # tessdata directory for tesserocr (default: compiled-in)
+    OCR_WORKERS: int = 0  # tile OCR threads (0 = CPU count)
+    OCR_TILING_ENABLED: bool = True
+    OCR_TILE_MIN_PIXELS: int = 2_000_000  # single-column images smaller than this are not tiled
+    OCR_TILE_MIN_HEIGHT: int = 400
+    OCR_TILE_OVERLAP: int = 40
+    OCR_MIN_QUALITY: float = 0.5  # reject scans scoring below this (0-1, 0 disables)
+    OCR_LOW_CONFIDENCE: int = 60  # word confidence (0-100) counted as unreliable
+    SCAN_MAX_IMAGES: int = 4  # photos per /api/analyze-images request
+
+    # Image uploads
+    UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024  # per image, enforced while streaming
+    UPLOAD_SPOOL_BYTES: int = 1024 * 1024  # kept in memory before spilling to disk
+
     # Groq Token Limits
     GROQ_TOKENS_FAST: int = 1000
     GROQ_TOKENS_NORMAL: int = 2000
@@ -64,6 +139,10 @@ GROQ_TIMEOUT = {
     "mobile": settings.GROQ_TIMEOUT_MOBILE / 1000
 }
 
+SMALL_MODEL_ROUTES = {
+    route.strip() for route in settings.GROQ_SMALL_MODEL_ROUTES.split(",") if route.strip()
+}
+
 GROQ_TOKENS = {
     "fast": settings.GROQ_TOKENS_FAST,
     "normal": settings.GROQ_TOKENS_NORMAL,
@@ -3,34 +3,93 @@ FastAPI Backend for AI Health Copilot
 Converted from Express.js to Python
 """
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, File, Form, HTTPException, Request, Response, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Awaitable, BinaryIO, Callable, NamedTuple
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import re
 import time
+import orjson
 from datetime import datetime
 
 from services.groq_service import GroqService
 from services.context_service import ContextService
+from services.groq_client import groq_client
+from services.ocr_loader import ocr_loader, OCRLoader
 from utils.cache import analysis_cache, context_cache
 from utils import validators, helpers
-from config.settings import settings
+from utils.metrics import metrics
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.session_store import session_store
+from utils.context_extractor import extract_context
+from utils.job_queue import job_queue, JobQueueFullError
+from utils.load_shedder import load_shedder, LoadShedder, LoadSheddingMiddleware, overloaded_body
+from utils.compression import CompressionMiddleware, choose_encoding, precompressed_bodies
+from utils.uploads import UploadLimitMiddleware, spool_request_body
+from utils.request_metrics import RequestMetricsMiddleware
+from config.settings import settings, GROQ_TIMEOUT
+
+# OCR (PIL + Tesseract) is imported on first image request or by the startup
+# warmup, not here, so it stays out of the process import path
+if TYPE_CHECKING:
+    from services.ocr_service import OCRService, OCRScan
+
+
+async def sweep_expired() -> None:
+    """Periodically delete expired state that is never read again"""
+    while True:
+        await asyncio.sleep(settings.SWEEP_INTERVAL_SECONDS)
+        try:
+            removed = session_store.cleanup_expired()
+            if removed:
+                print(f"🧹 Removed {removed} expired sessions")
+            # Chat replies are keyed by history, so most are never looked up again
+            removed = context_cache.cleanup_expired() + analysis_cache.cleanup_expired()
+            if removed:
+                print(f"🧹 Removed {removed} expired cache entries")
+        except Exception as e:
+            print(f"⚠️  Expiry sweep failed: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print(f"🚀 Smart Food Analyzer API starting...")
+    print(f"📍 Environment: {settings.NODE_ENV}")
+    print(f"🤖 AI Model: {settings.GROQ_MODEL}")
+    if settings.GROQ_ROUTING_ENABLED:
+        print(f"⚡ Small Model: {settings.GROQ_MODEL_SMALL} (routes: {settings.GROQ_SMALL_MODEL_ROUTES})")
+    print(f"🔑 API Key configured: {bool(settings.GROQ_API_KEY)}")
+    job_queue.start()
+    load_shedder.start()
+    print(f"📥 Job workers: {settings.JOB_WORKERS}")
+    sweeper = asyncio.create_task(sweep_expired())
+    if settings.OCR_WARMUP:
+        # Serve text requests right away; image requests wait for the load if needed
+        ocr_loader.start_warmup()
+    app.state.started = True
+
+    yield
+
+    print("🛑 Shutting down gracefully...")
+    app.state.started = False
+    sweeper.cancel()
+    await job_queue.stop()
+    load_shedder.stop()
+    analysis_cache.clear()
+    context_cache.clear()
 
-# Try to import OCR service (may not be available on all platforms)
-try:
-    from services.ocr_service import OCRService
-    OCR_AVAILABLE = True
-except Exception as e:
-    print(f"⚠️  OCR service not available: {e}")
-    print("📝 Manual text input will still work!")
-    OCR_AVAILABLE = False
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Smart Food Analyzer API",
     description="AI-native food ingredient analysis",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS Configuration
@@ -45,21 +104,48 @@ if settings.NODE_ENV == "production":
     # Allow all origins in production (Vercel domain will vary)
     origins = ["*"]
 
+# Shed low-priority paths under load; added before CORS so 503s still carry CORS headers
+app.add_middleware(
+    LoadSheddingMiddleware,
+    shedder=load_shedder,
+    priorities={
+        "/api/context": LoadShedder.LOW,
+        "/api/chat": LoadShedder.NORMAL,
+        "/api/ask": LoadShedder.NORMAL,
+        "/api/compare": LoadShedder.NORMAL,
+    }
+)
+
+# Cap upload bodies while they stream in (base64 bodies are 4/3 the image size)
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        "/api/analyze": settings.UPLOAD_MAX_BYTES * 4 // 3 + 64 * 1024,
+        "/api/analyze-images": (settings.UPLOAD_MAX_BYTES + 64 * 1024) * settings.SCAN_MAX_IMAGES,
+        "/api/jobs": settings.UPLOAD_MAX_BYTES * 4 // 3 + 64 * 1024,
+    },
+    part_limits={
+        "/api/analyze-images": settings.UPLOAD_MAX_BYTES,
+    }
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Content-Location", "Retry-After", "X-Request-ID", "X-Process-Time"],
 )
 
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_BYTES)
+
+# Outermost, so request IDs, X-Process-Time and counters cover every other layer
+app.add_middleware(RequestMetricsMiddleware)
+
 # Initialize services
 groq_service = GroqService()
 context_service = ContextService()
-if OCR_AVAILABLE:
-    ocr_service = OCRService()
-else:
-    ocr_service = None
 
 # Request Models
 class AnalyzeRequest(BaseModel):
@@ -79,6 +165,7 @@ class ChatRequest(BaseModel):
     message: str
     userContext: Optional[Dict[str, Any]] = None
     conversationHistory: List[Dict[str, Any]] = []
+    sessionId: Optional[str] = None
 
 class ContextRequest(BaseModel):
     message: str
@@ -86,7 +173,8 @@ class ContextRequest(BaseModel):
 
 class AskRequest(BaseModel):
     question: str
-    analysisContext: Dict[str, Any]
+    analysisId: Optional[str] = None
+    analysisContext: Optional[Dict[str, Any]] = None
     userContext: Optional[Dict[str, Any]] = None
 
 class CompareRequest(BaseModel):
@@ -94,100 +182,659 @@ class CompareRequest(BaseModel):
     product2: Dict[str, str]
     userContext: Optional[Dict[str, Any]] = None
 
+class SessionRequest(BaseModel):
+    userContext: Optional[Dict[str, Any]] = None
+
+class JobRequest(BaseModel):
+    type: str  # analyze | analyze-text
+    request: Dict[str, Any]
+    callbackUrl: Optional[str] = None
+
+
+SESSION_HEADER = "X-Session-ID"
+SESSION_COOKIE = "session_id"
+
+
+def get_session(http_request: Request, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Load the session named in the body, the X-Session-ID header or the session cookie"""
+    session_id = (
+        session_id
+        or http_request.headers.get(SESSION_HEADER)
+        or http_request.cookies.get(SESSION_COOKIE)
+    )
+    return session_store.get(session_id)
+
+
+def resolve_user_context(
+    session: Optional[Dict[str, Any]],
+    user_context: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """Merge a client-sent context delta into the session and return the context to use"""
+    if session is None:
+        return user_context
+    return session_store.merge_context(session, user_context) or None
+
+
+def resolve_analysis_context(request: AskRequest) -> Dict[str, Any]:
+    """Get the analysis a question refers to, by cached analysisId or as sent"""
+    analysis_context = request.analysisContext
+    if request.analysisId:
+        stored_result = analysis_cache.get_by_key(request.analysisId)
+        if stored_result:
+            analysis_context = orjson.loads(stored_result)["analysis"]
+        elif not analysis_context:
+            raise HTTPException(status_code=404, detail={
+                "code": "ANALYSIS_NOT_FOUND",
+                "message": "This analysis has expired. Please analyze the product again."
+            })
+
+    if not analysis_context:
+        raise HTTPException(
+            status_code=400,
+            detail="Analysis ID or analysis context is required"
+        )
+
+    return analysis_context
+
+
+def validated_text(text: str, validate: Callable[[str], Any]) -> str:
+    """Sanitize and validate text, raising a 400 on failure"""
+    text = validators.sanitize_text(text)
+    is_valid, error_msg = validate(text)
+    if not is_valid:
+        raise HTTPException(status_code=400, detail=error_msg)
+    return text
+
+
+def request_deadline(is_mobile: bool) -> Optional[float]:
+    """Overall time.monotonic() deadline for mobile requests, measured from arrival"""
+    if is_mobile:
+        return time.monotonic() + GROQ_TIMEOUT["mobile"]
+    return None
+
+
+def check_load(priority: str) -> None:
+    """Raise a fast 503 if work of this priority should be shed"""
+    if load_shedder.should_shed(priority):
+        raise HTTPException(
+            status_code=503,
+            detail=overloaded_body()["error"],
+            headers={"Retry-After": str(load_shedder.retry_after_seconds)}
+        )
+
+
+def analysis_priority(fast_mode: bool) -> str:
+    """Non-fast analyses are the slowest work and are shed first"""
+    return LoadShedder.NORMAL if fast_mode else LoadShedder.LOW
+
+
+def ai_unavailable(exc: CircuitOpenError) -> HTTPException:
+    """Structured 503 for requests rejected by the Groq circuit breaker"""
+    return HTTPException(
+        status_code=503,
+        detail={
+            "code": "AI_UNAVAILABLE",
+            "message": "AI analysis is temporarily unavailable. Please try again shortly."
+        },
+        headers={"Retry-After": str(max(int(exc.retry_after), 1))}
+    )
+
+
+def encode_result(result: Dict[str, Any]) -> bytes:
+    """
+    Serialize an analysis result for the cache
+
+    The `cached` flag is left out and prepended when the blob is served,
+    so cache hits never re-encode the analysis.
+    """
+    return orjson.dumps({key: value for key, value in result.items() if key != "cached"})
+
+
+def with_flags(blob: bytes, flags: bytes) -> bytes:
+    """Prepend pre-encoded members (e.g. b'"cached":true') to a serialized result"""
+    return b"{" + flags + b"," + blob[1:]
+
+
+def precompressed_encoding(body: bytes, http_request: Optional[Request]) -> Optional[str]:
+    """Encoding to send a precompressed body with, if the client and body size allow it"""
+    if http_request is None or len(body) < settings.COMPRESSION_MIN_BYTES:
+        return None
+    return choose_encoding(http_request.headers.get("accept-encoding", ""))
+
+
+def json_response(
+    body: bytes,
+    http_request: Optional[Request] = None,
+    precompressed: bool = False,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Send an already-serialized JSON body
+
+    With `precompressed`, the compressed body is kept and reused for the
+    next identical response instead of being recompressed by the
+    middleware each time. Use it for hot, repeated bodies like cache hits.
+    """
+    headers = dict(headers or {})
+    encoding = precompressed_encoding(body, http_request) if precompressed else None
+    if encoding:
+        body = precompressed_bodies.get(body, encoding)
+        headers["Content-Encoding"] = encoding
+        headers["Vary"] = "Accept-Encoding"
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+ANALYSIS_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def etag_matches(if_none_match: Optional[str], digest: str) -> bool:
+    """Check an If-None-Match header against a body digest, in any encoding"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
 
-# Middleware for request timing
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if tag.split("-", 1)[0] == digest:
+            return True
+    return False
+
+
+def analysis_key(ingredients_text: str, user_context: Optional[Dict[str, Any]]) -> Any:
+    """
+    Cache key data for an analysis
+
+    Personalized analyses are keyed by their user context too, so their
+    ID cannot be derived from the ingredient text alone and one user's
+    result is never served for another user's context.
+    """
+    if not user_context:
+        return ingredients_text
+    return {"ingredients": ingredients_text, "context": helpers.context_hash(user_context)}
+
+
+def is_personalized(blob: bytes) -> bool:
+    """Whether a serialized analysis was generated with a user's context"""
+    # Quotes inside string values are escaped, so only the real member matches
+    return b'"personalized":true' in blob
+
+
+def analysis_location(analysis_id: Optional[str]) -> Dict[str, str]:
+    """Content-Location header pointing at the cacheable GET for an analysis"""
+    return {"Content-Location": f"/api/analysis/{analysis_id}"} if analysis_id else {}
+
+
+def degraded_analysis(
+    ingredients_text: str,
+    product_name: str,
+    input_method: str,
+    fast_mode: bool,
+    is_mobile: bool,
+    start_time: float
+) -> Dict[str, Any]:
+    """Serve a local rule-based analysis while Groq is unhealthy"""
+    print("⚠️  AI unavailable - returning rule-based analysis")
+    return {
+        "ingredientsText": ingredients_text,
+        "productName": product_name,
+        "analysis": helpers.build_rule_based_analysis(ingredients_text),
+        "processingTime": time.time() - start_time,
+        "fastMode": fast_mode,
+        "isMobile": is_mobile,
+        "cached": False,
+        "degraded": True,
+        "aiTime": 0,
+        "inputMethod": input_method
+    }
+
+
+async def run_analysis(
+    ingredients_text: str,
+    product_name: str,
+    input_method: str,
+    user_context: Optional[Dict[str, Any]],
+    fast_mode: bool,
+    is_mobile: bool,
+    start_time: float,
+    deadline: Optional[float] = None
+) -> Dict[str, Any]:
+    """Run a Groq analysis and build the response payload"""
+    print("🤖 Starting Groq AI analysis...")
+    ai_start_time = time.time()
+
+    groq_result = await groq_service.analyze(
+        ingredients_text,
+        user_context=user_context,
+        fast_mode=fast_mode,
+        is_mobile=is_mobile,
+        deadline=deadline
+    )
+
+    ai_time = time.time() - ai_start_time
+    total_time = time.time() - start_time
+
+    print(f"✅ Analysis complete in {total_time*1000:.0f}ms (AI: {ai_time*1000:.0f}ms)")
+    return {
+        "analysisId": analysis_cache.key_for(analysis_key(ingredients_text, user_context)),
+        "ingredientsText": ingredients_text,
+        "productName": product_name,
+        "analysis": groq_result["analysis"],
+        "processingTime": total_time,
+        "fastMode": fast_mode,
+        "isMobile": is_mobile,
+        "cached": False,
+        "aiTime": ai_time,
+        "inputMethod": input_method,
+        "personalized": bool(user_context)
+    }
+
+
+class AnalysisBody(NamedTuple):
+    body: bytes  # serialized JSON response
+    cache_hit: bool  # served fresh from the cache
+    analysis_id: Optional[str]  # cache key, None if the result was not cached
+
+
+async def analyze_ingredients(
+    ingredients_text: str,
+    product_name: str,
+    input_method: str,
+    user_context: Optional[Dict[str, Any]],
+    fast_mode: bool,
+    is_mobile: bool,
+    start_time: float,
+    deadline: Optional[float] = None,
+    shed_load: bool = True
+) -> AnalysisBody:
+    """
+    Serve an analysis from cache or run it
+
+    Stale cache entries (past the soft TTL) are returned immediately and
+    refreshed in a background task, deduplicated per ingredient text.
+    Cache misses are shed under load unless `shed_load` is False, as for
+    queued jobs that were already admitted.
+    """
+    cache_key = analysis_key(ingredients_text, user_context)
+    analysis_id = analysis_cache.key_for(cache_key)
+    cached_result, is_stale = analysis_cache.get_with_state(cache_key)
+    if cached_result:
+        if is_stale:
+            print("♻️  Returning stale cached result, refreshing in background")
+            if not load_shedder.should_shed(LoadShedder.LOW):
+                async def refresh() -> bytes:
+                    return encode_result(await run_analysis(
+                        ingredients_text, product_name, input_method,
+                        user_context, fast_mode, False, time.time()
+                    ))
+
+                analysis_cache.refresh_in_background(cache_key, refresh)
+            return AnalysisBody(with_flags(cached_result, b'"cached":true,"stale":true'), False, analysis_id)
+
+        print("✅ Returning cached result")
+        return AnalysisBody(with_flags(cached_result, b'"cached":true'), True, analysis_id)
+
+    if shed_load:
+        check_load(analysis_priority(fast_mode))
+
+    try:
+        result = await run_analysis(
+            ingredients_text, product_name, input_method,
+            user_context, fast_mode, is_mobile, start_time, deadline
+        )
+    except CircuitOpenError:
+        return AnalysisBody(orjson.dumps(degraded_analysis(
+            ingredients_text, product_name, input_method,
+            fast_mode, is_mobile, start_time
+        )), False, None)
+
+    # Cache result
+    blob = encode_result(result)
+    analysis_cache.set(cache_key, blob)
+    return AnalysisBody(with_flags(blob, b'"cached":false'), False, analysis_id)
 
 
 # Routes
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness: the process is up and serving; no dependency is waited on"""
+    breaker = groq_client.breaker.stats()
     return {
-        "status": "OK",
+        "status": "OK" if breaker["state"] == CircuitBreaker.CLOSED else "DEGRADED",
+        "groq": breaker,
+        "load": load_shedder.stats(),
+        "ocr": ocr_loader.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
 
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness: startup has finished and OCR is not still loading
+
+    Returns 503 until then, so instances only get traffic once they can
+    serve every endpoint without a cold OCR load. A server without OCR is
+    ready, as text analysis still works.
+    """
+    started = getattr(app.state, "started", False)
+    ready = started and ocr_loader.status != OCRLoader.LOADING
+    return ORJSONResponse(
+        {
+            "status": "READY" if ready else "STARTING",
+            "checks": {
+                "startup": started,
+                "ocr": ocr_loader.status,
+                "jobWorkers": job_queue.stats()["workers"]
+            },
+            "timestamp": datetime.now().isoformat()
+        },
+        status_code=200 if ready else 503
+    )
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """AI usage counters (requests, tokens, errors and latency per model)"""
+    return {
+        "metrics": metrics.snapshot(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def extract_image_ingredients(image: str) -> str:
+    """Run OCR on a base64 image and check enough readable ingredient text was found"""
+    print(f"📷 Processing image with OCR...")
+
+    # Extract text from base64 image using OCR
+    try:
+        with load_shedder.track():
+            scan = ocr_loader.service.scan_image(ocr_loader.service.load_base64(image))
+    except Exception as e:
+        print(f"❌ OCR failed: {str(e)}")
+        raise HTTPException(status_code=400, detail={
+            "code": "OCR_FAILED",
+            "message": "Could not extract text from image. Please ensure the image is clear and contains ingredient text."
+        })
+
+    # Validate extracted text
+    ingredients_text = scan.text
+    require_sufficient_text(ingredients_text)
+    require_readable_scan(scan)
+
+    print(f"✅ Extracted {len(ingredients_text)} characters from image")
+    print(f"📝 Text preview: {ingredients_text[:100]}...")
+    return ingredients_text
+
+
+def scan_upload(image_file: BinaryIO, label: str = "the image") -> "OCRScan":
+    """Run OCR on an uploaded binary image, read straight from its spooled file"""
+    try:
+        with load_shedder.track():
+            return ocr_loader.service.scan_image(ocr_loader.service.load_image(image_file))
+    except Exception as e:
+        print(f"❌ OCR failed for {label}: {str(e)}")
+        raise HTTPException(status_code=400, detail={
+            "code": "OCR_FAILED",
+            "message": f"Could not extract text from {label}. Please ensure the image is clear and contains ingredient text."
+        })
+
+
+def extract_upload_text(image_file: BinaryIO, label: str = "the image") -> str:
+    """OCR an uploaded image and return its text once it passes the quality check"""
+    scan = scan_upload(image_file, label)
+    require_readable_scan(scan, label)
+    return scan.text
+
+
+def require_readable_scan(scan: "OCRScan", label: str = "the image") -> None:
+    """
+    Raise a 400 with guidance when a scan is too poor to be worth analyzing
+
+    Rejecting here saves the Groq call that would otherwise analyze OCR noise.
+    """
+    if settings.OCR_MIN_QUALITY <= 0:
+        return
+
+    quality = ocr_loader.service.assess_quality(scan)
+    if quality["score"] < settings.OCR_MIN_QUALITY:
+        raise poor_scan_error(quality, label)
+
+
+def merge_readable_scans(scans: List["OCRScan"]) -> "OCRScan":
+    """
+    Merge scans of several photos of one label, dropping unreadable ones
+
+    Each photo is only checked for legibility: a front panel or nutrition
+    table is readable but scores low on ingredient vocabulary, so the full
+    quality check runs once on the merged text. Photos with unreliable
+    words are dropped as long as at least one is readable.
+
+    Args:
+        scans: OCR results, one per photo
+
+    Returns:
+        A single scan with the merged, deduplicated ingredient text
+
+    Raises:
+        HTTPException: 400 when no photo is readable or the merged text fails the quality check
+    """
+    if settings.OCR_MIN_QUALITY > 0:
+        qualities = [ocr_loader.service.assess_quality(scan) for scan in scans]
+        readable = [
+            scan for scan, quality in zip(scans, qualities)
+            if quality["confidenceScore"] >= settings.OCR_MIN_QUALITY
+        ]
+        if not readable:
+            raise poor_scan_error(max(qualities, key=lambda quality: quality["confidenceScore"]), "the images")
+        if len(readable) < len(scans):
+            print(f"⚠️  Dropped {len(scans) - len(readable)} unreadable images")
+        scans = readable
+
+    merged = scans[0]._replace(
+        text=merge_scanned_text([scan.text for scan in scans]),
+        confidences=[confidence for scan in scans for confidence in scan.confidences]
+    )
+    require_readable_scan(merged, "the images")
+    return merged
+
+
+def poor_scan_error(quality: Dict[str, Any], label: str) -> HTTPException:
+    """Build the 400 for a scan that failed the quality check, with retake guidance"""
+    metrics.increment("ocr.rejected_low_quality")
+    print(f"❌ Poor scan quality for {label}: {quality}")
+
+    # Unreliable words mean a blurry or dark photo; readable words that are
+    # not label vocabulary mean the wrong thing was photographed
+    if quality["confidenceScore"] < settings.OCR_MIN_QUALITY + 0.1:
+        message = (
+            f"The text in {label} could not be read reliably. Please retake the photo "
+            "in good light, hold the camera steady, and make sure the text is in focus."
+        )
+    else:
+        message = (
+            f"{label.capitalize()} does not look like an ingredient list. Please frame just the "
+            "ingredients panel, filling the photo with the text."
+        )
+
+    return HTTPException(status_code=400, detail={
+        "code": "POOR_SCAN_QUALITY",
+        "message": message,
+        "quality": quality
+    })
+
+
+def require_sufficient_text(ingredients_text: str) -> None:
+    """Raise a 400 when OCR found too little ingredient text to analyze"""
+    if not ocr_loader.service.is_text_sufficient(ingredients_text):
+        print(f"❌ Insufficient text extracted: {ingredients_text[:50]}...")
+        raise HTTPException(status_code=400, detail={
+            "code": "INSUFFICIENT_INGREDIENTS",
+            "message": "Could not find enough ingredient text in the image. Please try a clearer photo focused on the ingredients list."
+        })
+
+
+def merge_scanned_text(texts: List[str]) -> str:
+    """Merge OCR text from several photos of one label, dropping repeated ingredients"""
+    return ", ".join(helpers.extract_ingredients(", ".join(texts)))
+
+
+async def require_ocr() -> "OCRService":
+    """Load OCR on first use, raising a 503 when it is not available on this server"""
+    ocr_service = await ocr_loader.ensure_loaded()
+    if ocr_service is None:
+        raise HTTPException(status_code=503, detail={
+            "code": "OCR_NOT_AVAILABLE",
+            "message": "OCR service is not available on this server. Please use manual text input instead. (Tesseract OCR requires system dependencies not available on free hosting tier)"
+        })
+    return ocr_service
+
+
 @app.post("/api/analyze")
-async def analyze_image(request: AnalyzeRequest):
+async def analyze_image(request: AnalyzeRequest, http_request: Request):
     """Analyze ingredient image with OCR"""
     try:
         # Check if OCR is available
-        if not OCR_AVAILABLE or ocr_service is None:
-            raise HTTPException(status_code=503, detail={
-                "code": "OCR_NOT_AVAILABLE",
-                "message": "OCR service is not available on this server. Please use manual text input instead. (Tesseract OCR requires system dependencies not available on free hosting tier)"
-            })
+        await require_ocr()
 
         start_time = time.time()
+        deadline = request_deadline(request.isMobile)
 
-        print(f"📷 Processing image with OCR...")
+        # OCR is paid before the cache can be checked, so shed before it
+        check_load(analysis_priority(request.fastMode))
 
-        # Extract text from base64 image using OCR
-        try:
-            ingredients_text = ocr_service.extract_text_from_base64(request.image)
-        except Exception as e:
-            print(f"❌ OCR failed: {str(e)}")
-            raise HTTPException(status_code=400, detail={
-                "code": "OCR_FAILED",
-                "message": "Could not extract text from image. Please ensure the image is clear and contains ingredient text."
-            })
+        # OCR blocks (and waits on the tile pool), so keep it off the event loop
+        ingredients_text = await asyncio.to_thread(extract_image_ingredients, request.image)
 
-        # Validate extracted text
-        if not ocr_service.is_text_sufficient(ingredients_text):
-            print(f"❌ Insufficient text extracted: {ingredients_text[:50]}...")
-            raise HTTPException(status_code=400, detail={
-                "code": "INSUFFICIENT_INGREDIENTS",
-                "message": "Could not find enough ingredient text in the image. Please try a clearer photo focused on the ingredients list."
-            })
+        analysis = await analyze_ingredients(
+            ingredients_text, "Scanned Product", "image",
+            resolve_user_context(get_session(http_request), request.userContext),
+            request.fastMode, request.isMobile,
+            start_time, deadline
+        )
+        return json_response(
+            analysis.body, http_request,
+            precompressed=analysis.cache_hit,
+            headers=analysis_location(analysis.analysis_id)
+        )
 
-        print(f"✅ Extracted {len(ingredients_text)} characters from image")
-        print(f"📝 Text preview: {ingredients_text[:100]}...")
-
-        # Check cache
-        cached_result = analysis_cache.get(ingredients_text)
-        if cached_result:
-            print("✅ Returning cached result")
-            return {**cached_result, "cached": True}
-
-        # Groq Analysis
-        print("🤖 Starting Groq AI analysis...")
-        ai_start_time = time.time()
-
-        groq_result = await groq_service.analyze(
-            ingredients_text,
-            user_context=request.userContext,
-            fast_mode=request.fastMode,
-            is_mobile=request.isMobile
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Analysis error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/analyze-images")
+async def analyze_images(
+    http_request: Request,
+    images: List[UploadFile] = File(...),
+    productName: Optional[str] = Form(None),
+    userContext: Optional[str] = Form(None),
+    fastMode: bool = Form(True),
+    isMobile: bool = Form(False)
+):
+    """
+    Analyze several photos of one product in a single request
+
+    Images are sent as multipart binary parts, OCR'd concurrently, and their
+    ingredients merged and deduplicated before a single analysis.
+    """
+    try:
+        await require_ocr()
+
+        start_time = time.time()
+        deadline = request_deadline(isMobile)
+
+        if len(images) > settings.SCAN_MAX_IMAGES:
+            raise HTTPException(status_code=400, detail=f"At most {settings.SCAN_MAX_IMAGES} images can be analyzed together")
+
+        user_context = None
+        if userContext:
+            try:
+                user_context = orjson.loads(userContext)
+            except orjson.JSONDecodeError:
+                user_context = None
+            if not isinstance(user_context, dict):
+                raise HTTPException(status_code=400, detail="userContext must be a JSON object")
+
+        check_load(analysis_priority(fastMode))
+
+        print(f"📷 Processing {len(images)} images with OCR...")
+        # Parts are already spooled to temporary files; PIL reads them in place
+        scans = await asyncio.gather(*(
+            asyncio.to_thread(scan_upload, image.file, f"image {index + 1}")
+            for index, image in enumerate(images)
+        ))
+
+        ingredients_text = merge_readable_scans(scans).text
+        require_sufficient_text(ingredients_text)
+
+        print(f"✅ Merged {len(ingredients_text)} characters from {len(images)} images")
+
+        analysis = await analyze_ingredients(
+            ingredients_text, productName or "Scanned Product", "image",
+            resolve_user_context(get_session(http_request), user_context),
+            fastMode, isMobile,
+            start_time, deadline
+        )
+        return json_response(
+            analysis.body, http_request,
+            precompressed=analysis.cache_hit,
+            headers=analysis_location(analysis.analysis_id)
         )
 
-        ai_time = time.time() - ai_start_time
-        total_time = time.time() - start_time
-
-        result = {
-            "ingredientsText": ingredients_text,
-            "productName": "Scanned Product",
-            "analysis": groq_result["analysis"],
-            "processingTime": total_time,
-            "fastMode": request.fastMode,
-            "isMobile": request.isMobile,
-            "cached": False,
-            "aiTime": ai_time,
-            "inputMethod": "image"
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Analysis error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Cache result
-        analysis_cache.set(ingredients_text, result)
 
-        print(f"✅ Analysis complete in {total_time*1000:.0f}ms (AI: {ai_time*1000:.0f}ms)")
-        return result
+@app.post("/api/analyze-upload")
+async def analyze_upload(
+    http_request: Request,
+    productName: Optional[str] = None,
+    fastMode: bool = True,
+    isMobile: bool = False
+):
+    """
+    Analyze an ingredient image sent as a raw binary body
+
+    The body (Content-Type: image/*) is streamed into a spooled temporary
+    file under the UPLOAD_MAX_BYTES cap and decoded by PIL from there,
+    avoiding the base64 string copies of /api/analyze.
+    """
+    try:
+        await require_ocr()
+
+        start_time = time.time()
+        deadline = request_deadline(isMobile)
+
+        if not http_request.headers.get("content-type", "").startswith("image/"):
+            raise HTTPException(status_code=415, detail="Send the image as the request body with an image/* Content-Type")
+
+        check_load(analysis_priority(fastMode))
+
+        with await spool_request_body(http_request, settings.UPLOAD_MAX_BYTES, settings.UPLOAD_SPOOL_BYTES) as image_file:
+            print("📷 Processing image with OCR...")
+            ingredients_text = await asyncio.to_thread(extract_upload_text, image_file)
+
+        require_sufficient_text(ingredients_text)
+        print(f"✅ Extracted {len(ingredients_text)} characters from image")
+
+        analysis = await analyze_ingredients(
+            ingredients_text, productName or "Scanned Product", "image",
+            resolve_user_context(get_session(http_request), None),
+            fastMode, isMobile,
+            start_time, deadline
+        )
+        return json_response(
+            analysis.body, http_request,
+            precompressed=analysis.cache_hit,
+            headers=analysis_location(analysis.analysis_id)
+        )
 
     except HTTPException:
         raise
@@ -197,10 +844,11 @@ async def analyze_image(request: AnalyzeRequest):
 
 
 @app.post("/api/analyze-text")
-async def analyze_text(request: AnalyzeTextRequest):
+async def analyze_text(request: AnalyzeTextRequest, http_request: Request):
     """Analyze manually typed ingredients"""
     try:
         start_time = time.time()
+        deadline = request_deadline(request.isMobile)
 
         # Validate ingredients
         ingredients_text = validators.sanitize_text(request.ingredients)
@@ -210,43 +858,17 @@ async def analyze_text(request: AnalyzeTextRequest):
 
         print(f"📝 Analyzing manually typed ingredients{f' for {request.productName}' if request.productName else ''}")
 
-        # Check cache
-        cached_result = analysis_cache.get(ingredients_text)
-        if cached_result:
-            print("✅ Returning cached result")
-            return {**cached_result, "cached": True}
-
-        # Groq Analysis
-        print("🤖 Starting Groq AI analysis...")
-        ai_start_time = time.time()
-
-        groq_result = await groq_service.analyze(
-            ingredients_text,
-            user_context=request.userContext,
-            fast_mode=request.fastMode,
-            is_mobile=request.isMobile
+        analysis = await analyze_ingredients(
+            ingredients_text, request.productName or "Manual Input", "manual",
+            resolve_user_context(get_session(http_request), request.userContext),
+            request.fastMode, request.isMobile,
+            start_time, deadline
+        )
+        return json_response(
+            analysis.body, http_request,
+            precompressed=analysis.cache_hit,
+            headers=analysis_location(analysis.analysis_id)
         )
-
-        ai_time = time.time() - ai_start_time
-        total_time = time.time() - start_time
-
-        result = {
-            "ingredientsText": ingredients_text,
-            "productName": request.productName or "Manual Input",
-            "analysis": groq_result["analysis"],
-            "processingTime": total_time,
-            "fastMode": request.fastMode,
-            "isMobile": request.isMobile,
-            "cached": False,
-            "aiTime": ai_time,
-            "inputMethod": "manual"
-        }
-
-        # Cache result
-        analysis_cache.set(ingredients_text, result)
-
-        print(f"✅ Analysis complete in {total_time*1000:.0f}ms (AI: {ai_time*1000:.0f}ms)")
-        return result
 
     except HTTPException:
         raise
@@ -255,8 +877,48 @@ async def analyze_text(request: AnalyzeTextRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/analysis/{analysis_id}")
+async def get_analysis(analysis_id: str, http_request: Request):
+    """
+    Get a previously computed analysis by its ID
+
+    Responses carry a strong ETag and Cache-Control so browsers and proxies
+    can cache them, and If-None-Match revalidations get a 304. Analyses
+    generated with a user's context are only cacheable by the browser.
+    """
+    blob, is_stale = (None, False)
+    if ANALYSIS_ID_PATTERN.match(analysis_id):
+        blob, is_stale = analysis_cache.get_by_key_with_state(analysis_id)
+
+    if blob is None:
+        raise HTTPException(status_code=404, detail={
+            "code": "ANALYSIS_NOT_FOUND",
+            "message": "This analysis has expired. Please analyze the product again."
+        })
+
+    body = with_flags(blob, b'"cached":true,"stale":true' if is_stale else b'"cached":true')
+
+    # Each encoding is a different representation, so it gets its own strong ETag
+    digest = hashlib.md5(body).hexdigest()
+    encoding = precompressed_encoding(body, http_request)
+    etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+    max_age = 0 if is_stale else settings.ANALYSIS_HTTP_MAX_AGE
+    scope = "private" if is_personalized(blob) else "public"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"{scope}, max-age={max_age}",
+        "Vary": "Accept-Encoding"
+    }
+
+    if etag_matches(http_request.headers.get("if-none-match"), digest):
+        return Response(status_code=304, headers=headers)
+
+    return json_response(body, http_request, precompressed=True, headers=headers)
+
+
 @app.post("/api/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """AI-powered chat responses"""
     try:
         # Validate message
@@ -267,12 +929,20 @@ async def chat(request: ChatRequest):
 
         print(f"💬 Chat request: \"{message[:50]}...\"")
 
+        session = get_session(http_request, request.sessionId)
+        user_context = resolve_user_context(session, request.userContext)
+
         response = await context_service.generate_chat_response(
             message,
-            request.userContext,
-            request.conversationHistory
+            user_context,
+            request.conversationHistory,
+            session_id=session["id"] if session else None,
+            context_key=session["contextHash"] if session else None
         )
 
+        if session:
+            session_store.merge_context(session, response.get("contextLearned"))
+
         return {
             **response,
             "success": True
@@ -286,7 +956,7 @@ async def chat(request: ChatRequest):
 
 
 @app.post("/api/context")
-async def infer_context(request: ContextRequest):
+async def infer_context(request: ContextRequest, http_request: Request):
     """Infer user context from their message"""
     try:
         # Validate message
@@ -295,11 +965,17 @@ async def infer_context(request: ContextRequest):
         if not is_valid:
             raise HTTPException(status_code=400, detail=error_msg)
 
+        session = get_session(http_request)
+        previous_context = resolve_user_context(session, request.previousContext)
+
         context = await context_service.infer_context(
             message,
-            request.previousContext
+            previous_context
         )
 
+        if session:
+            session_store.merge_context(session, context)
+
         return {
             "context": context,
             "success": True
@@ -313,7 +989,7 @@ async def infer_context(request: ContextRequest):
 
 
 @app.post("/api/ask")
-async def answer_question(request: AskRequest):
+async def answer_question(request: AskRequest, http_request: Request):
     """Answer follow-up questions"""
     try:
         # Validate question
@@ -322,16 +998,12 @@ async def answer_question(request: AskRequest):
         if not is_valid:
             raise HTTPException(status_code=400, detail=error_msg)
 
-        if not request.analysisContext:
-            raise HTTPException(
-                status_code=400,
-                detail="Analysis context is required"
-            )
+        analysis_context = resolve_analysis_context(request)
 
         response = await context_service.answer_question(
             question,
-            request.analysisContext,
-            request.userContext
+            analysis_context,
+            resolve_user_context(get_session(http_request), request.userContext)
         )
 
         return {
@@ -347,7 +1019,7 @@ async def answer_question(request: AskRequest):
 
 
 @app.post("/api/compare")
-async def compare_products(request: CompareRequest):
+async def compare_products(request: CompareRequest, http_request: Request):
     """Compare two products"""
     try:
         # Validate both products
@@ -363,17 +1035,19 @@ async def compare_products(request: CompareRequest):
 
         print(f"🔍 Comparing: {product1_name} vs {product2_name}")
 
+        user_context = resolve_user_context(get_session(http_request), request.userContext)
+
         # Analyze both products in parallel
         import asyncio
         analysis1, analysis2 = await asyncio.gather(
             groq_service.analyze(
                 request.product1["ingredients"],
-                user_context=request.userContext,
+                user_context=user_context,
                 fast_mode=True
             ),
             groq_service.analyze(
                 request.product2["ingredients"],
-                user_context=request.userContext,
+                user_context=user_context,
                 fast_mode=True
             )
         )
@@ -382,7 +1056,7 @@ async def compare_products(request: CompareRequest):
         comparison = await groq_service.compare_products(
             request.product1,
             request.product2,
-            request.userContext
+            user_context
         )
 
         return {
@@ -394,46 +1068,341 @@ async def compare_products(request: CompareRequest):
 
     except HTTPException:
         raise
+    except CircuitOpenError as e:
+        raise ai_unavailable(e)
     except Exception as e:
         print(f"❌ Comparison error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/session")
+async def create_session(request: SessionRequest, response: Response):
+    """Create a server-side session holding user context and chat state"""
+    session = session_store.create()
+    user_context = session_store.merge_context(session, request.userContext)
+
+    response.set_cookie(SESSION_COOKIE, session["id"], httponly=True, samesite="lax")
+    return {
+        "sessionId": session["id"],
+        "userContext": user_context,
+        "success": True
+    }
+
+
+@app.get("/api/session")
+async def get_session_state(http_request: Request):
+    """Get the current session's user context"""
+    session = get_session(http_request)
+    if session is None:
+        raise HTTPException(status_code=404, detail={
+            "code": "SESSION_NOT_FOUND",
+            "message": "Session not found or expired"
+        })
+
+    memory = session.get("memory") or {}
+    return {
+        "sessionId": session["id"],
+        "userContext": session["userContext"],
+        "turns": len(memory.get("turns", [])),
+        "success": True
+    }
+
+
+@app.delete("/api/session")
+async def delete_session(http_request: Request, response: Response):
+    """End the current session"""
+    session = get_session(http_request)
+    if session:
+        session_store.delete(session["id"])
+
+    response.delete_cookie(SESSION_COOKIE)
+    return {"success": True}
+
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: JobRequest, http_request: Request, response: Response):
+    """
+    Queue an analysis and return a job ID immediately
+
+    The job runs on the bounded worker pool. Poll GET /api/jobs/{jobId}
+    for the result, or pass callbackUrl to have the finished job POSTed.
+    """
+    try:
+        if request.callbackUrl:
+            is_valid, error_msg = validators.validate_callback_url(request.callbackUrl)
+            if not is_valid:
+                raise HTTPException(status_code=400, detail=error_msg)
+
+        user_context = resolve_user_context(
+            get_session(http_request),
+            request.request.get("userContext")
+        )
+
+        if request.type == "analyze":
+            await require_ocr()
+            analyze_request = AnalyzeRequest.model_validate(request.request)
+
+            async def run_job():
+                start_time = time.time()
+                ingredients_text = await asyncio.to_thread(extract_image_ingredients, analyze_request.image)
+                analysis = await analyze_ingredients(
+                    ingredients_text, "Scanned Product", "image", user_context,
+                    analyze_request.fastMode, analyze_request.isMobile, start_time,
+                    shed_load=False
+                )
+                return orjson.loads(analysis.body)
+
+        elif request.type == "analyze-text":
+            text_request = AnalyzeTextRequest.model_validate(request.request)
+            ingredients_text = validated_text(text_request.ingredients, validators.validate_ingredients)
+
+            async def run_job():
+                analysis = await analyze_ingredients(
+                    ingredients_text, text_request.productName or "Manual Input", "manual",
+                    user_context, text_request.fastMode, text_request.isMobile, time.time(),
+                    shed_load=False
+                )
+                return orjson.loads(analysis.body)
+
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown job type: {request.type}")
+
+        try:
+            job = job_queue.submit(run_job, request.callbackUrl)
+        except JobQueueFullError:
+            raise HTTPException(
+                status_code=503,
+                detail={
+                    "code": "QUEUE_FULL",
+                    "message": "Too many analyses are queued. Please try again shortly."
+                },
+                headers={"Retry-After": "5"}
+            )
+
+        status_url = f"/api/jobs/{job['jobId']}"
+        response.headers["Location"] = status_url
+        print(f"📥 Queued {request.type} job {job['jobId']}")
+
+        return {
+            "jobId": job["jobId"],
+            "status": job["status"],
+            "statusUrl": status_url,
+            "success": True
+        }
+
+    except HTTPException:
+        raise
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors(include_url=False, include_context=False))
+    except Exception as e:
+        print(f"❌ Job submission error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get a job's status, and its result once completed"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail={
+            "code": "JOB_NOT_FOUND",
+            "message": "Job not found or expired"
+        })
+
+    return {**job, "success": True}
+
+
+# WebSocket operations
+SendFrame = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+async def ws_chat(frame: Dict[str, Any], session_id: Optional[str], send: SendFrame) -> Dict[str, Any]:
+    """Stream a chat reply; context is learned locally from the message"""
+    request = ChatRequest.model_validate(frame)
+    message = validated_text(request.message, validators.validate_message)
+
+    session = session_store.get(request.sessionId or session_id)
+    user_context = resolve_user_context(session, request.userContext)
+
+    parts = []
+    async for delta in context_service.stream_chat_response(
+        message,
+        user_context,
+        request.conversationHistory,
+        session_id=session["id"] if session else None,
+        context_key=session["contextHash"] if session else None
+    ):
+        parts.append(delta)
+        await send({"type": "token", "delta": delta})
+
+    # Only unambiguous statements about the user are learned without the AI
+    local_context = extract_context(message)
+    context_learned = {}
+    if local_context and local_context.pop("confidence") == "high":
+        context_learned = local_context
+    if session:
+        session_store.merge_context(session, context_learned)
+
+    return {"response": "".join(parts), "contextLearned": context_learned}
+
+
+async def ws_ask(frame: Dict[str, Any], session_id: Optional[str], send: SendFrame) -> Dict[str, Any]:
+    """Stream an answer to a follow-up question"""
+    request = AskRequest.model_validate(frame)
+    question = validated_text(request.question, validators.validate_question)
+    analysis_context = resolve_analysis_context(request)
+    user_context = resolve_user_context(session_store.get(session_id), request.userContext)
+
+    parts = []
+    async for delta in context_service.stream_answer(question, analysis_context, user_context):
+        parts.append(delta)
+        await send({"type": "token", "delta": delta})
+
+    return {"answer": "".join(parts)}
+
+
+async def ws_context(frame: Dict[str, Any], session_id: Optional[str], send: SendFrame) -> Dict[str, Any]:
+    """Infer user context; replies in one frame since there is nothing to stream"""
+    request = ContextRequest.model_validate(frame)
+    message = validated_text(request.message, validators.validate_message)
+
+    session = session_store.get(session_id)
+    context = await context_service.infer_context(
+        message,
+        resolve_user_context(session, request.previousContext)
+    )
+    if session:
+        session_store.merge_context(session, context)
+
+    return {"context": context}
+
+
+WS_OPERATIONS = {
+    "chat": ws_chat,
+    "ask": ws_ask,
+    "context": ws_context,
+}
+
+WS_PRIORITIES = {
+    "chat": LoadShedder.NORMAL,
+    "ask": LoadShedder.NORMAL,
+    "context": LoadShedder.LOW,
+}
+
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    """
+    Chat, follow-up questions and context inference over one connection
+
+    Clients send JSON frames {"id", "type": "chat"|"ask"|"context", ...}
+    with the same fields as the matching POST endpoint, or
+    {"id", "type": "cancel"} to stop an operation. Operations run
+    concurrently; every reply frame carries the operation's id. Streaming
+    operations send {"type": "token", "delta"} frames, then each operation
+    ends with one "done" or "error" frame.
+    """
+    await websocket.accept()
+
+    session_id = (
+        websocket.query_params.get("sessionId")
+        or websocket.headers.get(SESSION_HEADER)
+        or websocket.cookies.get(SESSION_COOKIE)
+    )
+    send_lock = asyncio.Lock()
+    operations: Dict[str, asyncio.Task] = {}
+
+    async def send(frame: Dict[str, Any]) -> None:
+        async with send_lock:
+            await websocket.send_text(orjson.dumps(frame).decode())
+
+    async def send_error(op_id: Any, code: str, message: Any) -> None:
+        try:
+            await send({"id": op_id, "type": "error", "error": {"code": code, "message": message}})
+        except Exception:
+            pass
+
+    async def run(op_id: str, handler, frame: Dict[str, Any]) -> None:
+        async def send_frame(reply: Dict[str, Any]) -> None:
+            await send({"id": op_id, **reply})
+
+        try:
+            result = await handler(frame, session_id, send_frame)
+            await send_frame({"type": "done", **result, "success": True})
+        except HTTPException as e:
+            if isinstance(e.detail, dict):
+                await send_error(op_id, e.detail.get("code", "BAD_REQUEST"), e.detail.get("message"))
+            else:
+                await send_error(op_id, "BAD_REQUEST", e.detail)
+        except ValidationError as e:
+            await send_error(op_id, "BAD_REQUEST", e.errors(include_url=False, include_context=False))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ WebSocket {frame.get('type')} error: {str(e)}")
+            await send_error(op_id, "INTERNAL_ERROR", "Internal server error")
+        finally:
+            operations.pop(op_id, None)
+
+    try:
+        while True:
+            try:
+                frame = orjson.loads(await websocket.receive_text())
+            except ValueError:
+                await send_error(None, "BAD_REQUEST", "Frames must be JSON objects")
+                continue
+
+            if not isinstance(frame, dict):
+                await send_error(None, "BAD_REQUEST", "Frames must be JSON objects")
+                continue
+
+            op_id = frame.get("id")
+            op_type = frame.get("type")
+
+            if not isinstance(op_id, str) or not op_id:
+                await send_error(op_id, "BAD_REQUEST", "Frame id is required")
+            elif op_type == "cancel":
+                task = operations.pop(op_id, None)
+                if task:
+                    task.cancel()
+                    await send({"id": op_id, "type": "cancelled"})
+            elif op_type not in WS_OPERATIONS:
+                await send_error(op_id, "BAD_REQUEST", f"Unknown type: {op_type}")
+            elif op_id in operations:
+                await send_error(op_id, "BAD_REQUEST", "Operation id already in use")
+            elif len(operations) >= settings.WS_MAX_OPERATIONS:
+                await send_error(op_id, "TOO_MANY_OPERATIONS", "Too many operations in flight")
+            elif load_shedder.should_shed(WS_PRIORITIES[op_type]):
+                await send_error(op_id, "OVERLOADED", overloaded_body()["error"]["message"])
+            else:
+                operations[op_id] = asyncio.create_task(run(op_id, WS_OPERATIONS[op_type], frame))
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in operations.values():
+            task.cancel()
+
+
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
-        content={"error": exc.detail}
+        content={"error": exc.detail},
+        headers=getattr(exc, "headers", None)
     )
 
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    print(f"❌ Unhandled error: {str(exc)}")
-    return JSONResponse(
+    print(f"❌ Unhandled error (request {getattr(request.state, 'request_id', '-')}): {str(exc)}")
+    return ORJSONResponse(
         status_code=500,
         content={"error": "Internal server error"}
     )
 
 
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    print(f"🚀 Smart Food Analyzer API starting...")
-    print(f"📍 Environment: {settings.NODE_ENV}")
-    print(f"🤖 AI Model: {settings.GROQ_MODEL}")
-    print(f"🔑 API Key configured: {bool(settings.GROQ_API_KEY)}")
-
-
-# Shutdown event
-@app.on_event("shutdown")
-async def shutdown_event():
-    print("🛑 Shutting down gracefully...")
-    analysis_cache.clear()
-    context_cache.clear()
-
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
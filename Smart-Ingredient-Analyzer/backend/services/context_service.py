@@ -3,160 +3,188 @@ Context Service
 Handles user context inference and conversational responses
 """
 
-import json
-import re
-import httpx
-from typing import Dict, Any, Optional, List
-
-from config.settings import settings
+from typing import Dict, Any, AsyncIterator, Optional, List
+
+from services import prompts
+from services.conversation_memory import conversation_memory
+from services.model_router import model_router
+from services.schemas import (
+    ContextResponse,
+    ChatResponse,
+    AnswerResponse,
+    ResponseParseError
+)
+from utils.cache import context_cache
+from utils.context_extractor import extract_context
+from utils.helpers import merge_user_context, normalize_message, context_hash, project_analysis
+from utils.metrics import metrics
 
 
 class ContextService:
     """Service for context management and chat"""
 
     def __init__(self):
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.api_key = settings.GROQ_API_KEY
-        self.model = settings.GROQ_MODEL
+        self.router = model_router
 
     async def infer_context(
         self,
         message: str,
         previous_context: Optional[Dict] = None
     ) -> Dict[str, Any]:
-        """Infer user context from message"""
-        prev_context_str = ""
-        if previous_context:
-            prev_context_str = f"\n\nPREVIOUS CONTEXT:\n{json.dumps(previous_context, indent=2)}"
-
-        prompt = f"""You are an AI health assistant analyzing user messages to understand their health concerns, dietary preferences, and goals.
-
-{prev_context_str}
-
-USER MESSAGE:
-"{message}"
-
-Extract and infer the following as JSON:
-{{
-  "healthConcerns": ["list of health conditions or concerns mentioned or implied"],
-  "dietaryPreferences": ["vegan, vegetarian, keto, paleo, etc."],
-  "allergens": ["specific food allergens mentioned"],
-  "goals": ["weight loss, muscle gain, heart health, etc."],
-  "confidence": "low|medium|high"
-}}
-
-Return ONLY valid JSON, no markdown. Merge with previous context if provided."""
-
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    self.base_url,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {self.api_key}"
-                    },
-                    json={
-                        "model": self.model,
-                        "temperature": 0.1,
-                        "max_tokens": 500,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ]
-                    }
+        """
+        Infer user context from message
+
+        Unambiguous messages are answered by the local extractor. Otherwise
+        only the message is sent to the AI; the result is cached per
+        normalized message and merged into the previous context locally.
+        """
+        local_context = extract_context(message)
+        if local_context and local_context["confidence"] == "high":
+            metrics.increment("context.local_hits")
+            return merge_user_context(previous_context or {}, local_context)
+
+        cache_key = {"type": "context", "message": normalize_message(message)}
+        inferred = context_cache.get(cache_key)
+
+        if inferred is None:
+            try:
+                inferred = await self.router.complete_json(
+                    "context",
+                    len(message),
+                    prompts.context_messages(message),
+                    ContextResponse,
+                    temperature=0.1,
+                    max_tokens=500,
+                    timeout=10.0
                 )
+                context_cache.set(cache_key, inferred)
 
-            data = response.json()
-            content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
-
-            # Extract JSON
-            json_match = re.search(r'\{[\s\S]*\}', content)
-            if json_match:
-                context = json.loads(json_match.group(0))
-                return context
-            else:
-                return {}
+            except Exception as e:
+                print(f"❌ Context inference error: {str(e)}")
+                return previous_context or {}
 
-        except Exception as e:
-            print(f"❌ Context inference error: {str(e)}")
-            return {}
+        return merge_user_context(previous_context or {}, inferred)
 
     async def generate_chat_response(
         self,
         message: str,
         user_context: Optional[Dict] = None,
-        conversation_history: Optional[List[Dict]] = None
+        conversation_history: Optional[List[Dict]] = None,
+        session_id: Optional[str] = None,
+        context_key: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Generate AI chat response"""
-        context_str = ""
-        if user_context:
-            context_str = f"\n\nUSER CONTEXT:\n{json.dumps(user_context, indent=2)}"
-
-        history_str = ""
-        if conversation_history:
-            recent_history = conversation_history[-6:]  # Last 6 messages
-            history_str = "\n\nRECENT CONVERSATION:\n"
-            for msg in recent_history:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                history_str += f"{role.upper()}: {content}\n"
-
-        prompt = f"""You are an AI health copilot having a natural conversation with a user about food and health.
-
-{context_str}
-{history_str}
-
-USER: {message}
-
-Respond naturally and conversationally. If the user mentions health concerns, acknowledge them and offer to help. Be helpful but concise (2-3 sentences).
-
-Also infer if there's any new context to learn from this message. Return JSON:
-{{
-  "response": "Your conversational response",
-  "contextLearned": {{
-    "healthConcerns": [],
-    "allergens": [],
-    "dietaryPreferences": [],
-    "goals": []
-  }}
-}}
-
-Return ONLY valid JSON."""
-
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    self.base_url,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {self.api_key}"
-                    },
-                    json={
-                        "model": self.model,
-                        "temperature": 0.3,
-                        "max_tokens": 500,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ]
-                    }
+        """
+        Generate AI chat response
+
+        History is fitted into a token budget. With a session ID, turns are
+        kept server-side and older ones are folded into a rolling summary.
+        `context_key` is a precomputed hash of user_context, if available.
+        """
+        history_lines, summary = conversation_memory.build(session_id, conversation_history)
+        cache_key = self._chat_cache_key(message, user_context, context_key, history_lines, summary)
+        chat_response = context_cache.get(cache_key)
+
+        if chat_response is None:
+            try:
+                chat_response = await self.router.complete_json(
+                    "chat",
+                    len(message) + sum(len(line) for line in history_lines),
+                    prompts.chat_messages(message, user_context, history_lines, summary),
+                    ChatResponse,
+                    temperature=0.3,
+                    max_tokens=500,
+                    timeout=10.0
                 )
+                context_cache.set(cache_key, chat_response)
 
-            data = response.json()
-            content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+            except ResponseParseError as e:
+                # Plain-text reply without the JSON envelope is still usable
+                chat_response = {"response": e.content, "contextLearned": {}}
 
-            # Extract JSON
-            json_match = re.search(r'\{[\s\S]*\}', content)
-            if json_match:
-                result = json.loads(json_match.group(0))
-                return result
-            else:
-                return {"response": content, "contextLearned": {}}
+            except Exception as e:
+                print(f"❌ Chat error: {str(e)}")
+                return {
+                    "response": "I'm having trouble responding right now. Could you try again?",
+                    "contextLearned": {}
+                }
 
-        except Exception as e:
-            print(f"❌ Chat error: {str(e)}")
-            return {
-                "response": "I'm having trouble responding right now. Could you try again?",
-                "contextLearned": {}
-            }
+        if session_id:
+            conversation_memory.record(
+                session_id, message, chat_response["response"], conversation_history
+            )
+
+        return chat_response
+
+    async def stream_chat_response(
+        self,
+        message: str,
+        user_context: Optional[Dict] = None,
+        conversation_history: Optional[List[Dict]] = None,
+        session_id: Optional[str] = None,
+        context_key: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream an AI chat reply as it is generated
+
+        Uses the plain-text chat prompt, so no context is learned from the
+        reply; callers use the local extractor instead. A cached reply is
+        yielded in one piece. The finished reply is cached and recorded in
+        the session memory like generate_chat_response(); it is cached under
+        its own key type, as it has no learned context for /api/chat to serve.
+        """
+        history_lines, summary = conversation_memory.build(session_id, conversation_history)
+        cache_key = self._chat_cache_key(
+            message, user_context, context_key, history_lines, summary, kind="chat_stream"
+        )
+        chat_response = context_cache.get(
+            self._chat_cache_key(message, user_context, context_key, history_lines, summary)
+        ) or context_cache.get(cache_key)
+
+        if chat_response is not None:
+            reply = chat_response["response"]
+            yield reply
+        else:
+            parts = []
+            try:
+                async for delta in self.router.stream(
+                    "chat",
+                    len(message) + sum(len(line) for line in history_lines),
+                    prompts.chat_messages(message, user_context, history_lines, summary, stream=True),
+                    temperature=0.3,
+                    max_tokens=500,
+                    timeout=10.0
+                ):
+                    parts.append(delta)
+                    yield delta
+
+            except Exception as e:
+                print(f"❌ Chat stream error: {str(e)}")
+                if not parts:
+                    yield "I'm having trouble responding right now. Could you try again?"
+                return
+
+            reply = "".join(parts)
+            context_cache.set(cache_key, {"response": reply, "contextLearned": {}})
+
+        if session_id:
+            conversation_memory.record(session_id, message, reply, conversation_history)
+
+    def _chat_cache_key(
+        self,
+        message: str,
+        user_context: Optional[Dict],
+        context_key: Optional[str],
+        history_lines: List[str],
+        summary: str,
+        kind: str = "chat"
+    ) -> Dict[str, Any]:
+        return {
+            "type": kind,
+            "message": normalize_message(message),
+            "context": context_key if context_key is not None else context_hash(user_context),
+            "history": history_lines,
+            "summary": summary
+        }
 
     async def answer_question(
         self,
@@ -164,61 +192,29 @@ Return ONLY valid JSON."""
         analysis_context: Dict[str, Any],
         user_context: Optional[Dict] = None
     ) -> Dict[str, Any]:
-        """Answer follow-up questions about analysis"""
-        context_str = ""
-        if user_context:
-            context_str = f"\n\nUSER CONTEXT:\n{json.dumps(user_context, indent=2)}"
-
-        analysis_str = f"\n\nANALYSIS CONTEXT:\n{json.dumps(analysis_context, indent=2)}"
-
-        prompt = f"""You are an AI health assistant answering a follow-up question about a previous ingredient analysis.
-
-{context_str}
-{analysis_str}
-
-USER QUESTION: {question}
-
-Provide a helpful, concise answer. Return JSON:
-{{
-  "answer": "Your answer to the question",
-  "reasoning": "Brief explanation of your reasoning",
-  "suggestions": ["related questions they might want to ask"]
-}}
-
-Return ONLY valid JSON."""
+        """
+        Answer follow-up questions about analysis
 
+        Only the parts of the analysis relevant to the question are sent.
+        """
+        analysis_context = project_analysis(analysis_context, question)
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    self.base_url,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {self.api_key}"
-                    },
-                    json={
-                        "model": self.model,
-                        "temperature": 0.2,
-                        "max_tokens": 600,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ]
-                    }
-                )
-
-            data = response.json()
-            content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
-
-            # Extract JSON
-            json_match = re.search(r'\{[\s\S]*\}', content)
-            if json_match:
-                result = json.loads(json_match.group(0))
-                return result
-            else:
-                return {
-                    "answer": content,
-                    "reasoning": "",
-                    "suggestions": []
-                }
+            return await self.router.complete_json(
+                "ask",
+                len(question),
+                prompts.answer_messages(question, analysis_context, user_context),
+                AnswerResponse,
+                temperature=0.2,
+                max_tokens=600,
+                timeout=10.0
+            )
+
+        except ResponseParseError as e:
+            return {
+                "answer": e.content,
+                "reasoning": "",
+                "suggestions": []
+            }
 
         except Exception as e:
             print(f"❌ Question answering error: {str(e)}")
@@ -227,3 +223,31 @@ Return ONLY valid JSON."""
                 "reasoning": "",
                 "suggestions": []
             }
+
+    async def stream_answer(
+        self,
+        question: str,
+        analysis_context: Dict[str, Any],
+        user_context: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a plain-text answer to a follow-up question as it is generated
+        """
+        analysis_context = project_analysis(analysis_context, question)
+        answered = False
+        try:
+            async for delta in self.router.stream(
+                "ask",
+                len(question),
+                prompts.answer_messages(question, analysis_context, user_context, stream=True),
+                temperature=0.2,
+                max_tokens=600,
+                timeout=10.0
+            ):
+                answered = True
+                yield delta
+
+        except Exception as e:
+            print(f"❌ Question answering stream error: {str(e)}")
+            if not answered:
+                yield "I'm having trouble answering that right now. Could you rephrase?"
@@ -0,0 +1,188 @@
+"""
+Conversation Memory
+Token-budgeted chat history with a rolling summary of older turns
+"""
+
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from config.settings import settings
+from utils.cache import SimpleCache
+from utils.session_store import session_store
+
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in text
+
+    Counts punctuation as one token and words as one token per four
+    characters, which tracks BPE tokenizers closely for English prose.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Truncate text to roughly max_tokens tokens
+
+    Args:
+        text: Text to truncate
+        max_tokens: Token budget
+
+    Returns:
+        Text cut at a word boundary, with an ellipsis if shortened
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    kept = []
+    used = 0
+    for word in text.split():
+        cost = count_tokens(word)
+        if used + cost > max_tokens:
+            break
+        kept.append(word)
+        used += cost
+
+    return " ".join(kept) + "…"
+
+
+def _format_turn(turn: Dict[str, Any]) -> str:
+    role = str(turn.get("role", "user")).upper()
+    content = truncate_to_tokens(str(turn.get("content", "")), settings.CHAT_MESSAGE_TOKEN_LIMIT)
+    return f"{role}: {content}"
+
+
+def _summarize_turn(turn: Dict[str, Any]) -> str:
+    """Compress a turn to its first sentence"""
+    role = "User" if turn.get("role", "user") == "user" else "Assistant"
+    first_sentence = _SENTENCE_END.split(str(turn.get("content", "")).strip(), maxsplit=1)[0]
+    return f"{role}: {truncate_to_tokens(first_sentence, 30)}"
+
+
+class ConversationMemory:
+    """
+    Per-session chat memory kept within a token budget
+
+    Recent turns are kept verbatim. When they exceed the history budget,
+    the oldest turns are folded into a rolling extractive summary, which is
+    itself trimmed to the summary budget by dropping its oldest lines.
+    """
+
+    def __init__(self, store: Optional[SimpleCache] = None):
+        """
+        Initialize memory
+
+        Args:
+            store: Object with get/set holding per-session memory records
+                (default: a cache with 1 hour TTL)
+        """
+        self.store = store or SimpleCache(ttl_seconds=3600)
+        self.history_budget = settings.CHAT_HISTORY_TOKEN_BUDGET
+        self.summary_budget = settings.CHAT_SUMMARY_TOKEN_BUDGET
+
+    def fit(
+        self,
+        turns: List[Dict[str, Any]],
+        summary_lines: Optional[List[str]] = None
+    ) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """
+        Fit turns into the history budget
+
+        Args:
+            turns: Conversation turns, oldest first
+            summary_lines: Existing summary lines to extend
+
+        Returns:
+            Tuple of (history lines, summary lines, turns kept verbatim)
+        """
+        kept_lines: List[str] = []
+        used = 0
+        split_index = len(turns)
+
+        for index in range(len(turns) - 1, -1, -1):
+            line = _format_turn(turns[index])
+            cost = count_tokens(line)
+            if used + cost > self.history_budget:
+                break
+            kept_lines.insert(0, line)
+            used += cost
+            split_index = index
+
+        summary = list(summary_lines or [])
+        summary.extend(_summarize_turn(turn) for turn in turns[:split_index])
+        while summary and count_tokens("\n".join(summary)) > self.summary_budget:
+            summary.pop(0)
+
+        return kept_lines, summary, turns[split_index:]
+
+    def build(
+        self,
+        session_id: Optional[str],
+        conversation_history: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[List[str], str]:
+        """
+        Get the history lines and summary to include in a chat prompt
+
+        Args:
+            session_id: Session to read server-side memory from, if any
+            conversation_history: Client-sent history, used when there is no
+                session or the session has no turns yet
+
+        Returns:
+            Tuple of (history lines, summary text)
+        """
+        record = self.store.get(session_id) if session_id else None
+
+        if record and record["turns"]:
+            turns = record["turns"]
+            summary_lines = record["summary"]
+        else:
+            turns = list(conversation_history or [])
+            summary_lines = []
+
+        history_lines, summary_lines, _ = self.fit(turns, summary_lines)
+        return history_lines, "\n".join(summary_lines)
+
+    def record(
+        self,
+        session_id: str,
+        user_message: str,
+        assistant_reply: str,
+        conversation_history: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
+        """
+        Append a completed exchange to a session's memory
+
+        Args:
+            session_id: Session ID
+            user_message: User message
+            assistant_reply: Assistant reply
+            conversation_history: Client-sent history used to seed a new session
+        """
+        record = self.store.get(session_id) or {
+            "turns": list(conversation_history or []),
+            "summary": []
+        }
+
+        turns = record["turns"] + [
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": assistant_reply}
+        ]
+        _, summary_lines, kept_turns = self.fit(turns, record["summary"])
+
+        self.store.set(session_id, {"turns": kept_turns, "summary": summary_lines})
+
+
+# Global memory instance
+conversation_memory = ConversationMemory(session_store.memory_records())
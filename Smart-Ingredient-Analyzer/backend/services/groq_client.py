@@ -0,0 +1,465 @@
+"""
+Groq API Client
+Shared call path for Groq chat completions
+"""
+
+import asyncio
+import time
+import httpx
+import orjson
+from collections import defaultdict, deque
+from typing import Dict, Any, AsyncIterator, Deque, List, Optional, Tuple, Type
+
+from config.settings import settings
+from services.schemas import ResponseParseError, parse_response
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.load_shedder import load_shedder
+from utils.metrics import metrics
+
+
+class GroqAPIError(Exception):
+    """Raised when the Groq API returns an error"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, code: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code  # Groq error code, e.g. json_validate_failed
+
+    @property
+    def is_upstream_failure(self) -> bool:
+        """Whether the error reflects upstream health (timeouts, 429, 5xx)"""
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+    @property
+    def is_json_validation_failure(self) -> bool:
+        """Whether Groq rejected the model's output as invalid JSON (JSON mode)"""
+        return self.status_code == 400 and (
+            self.code == "json_validate_failed" or "json_validate_failed" in str(self)
+        )
+
+
+class GroqDeadlineExceededError(GroqAPIError):
+    """Raised when the deadline ran out before a request was sent (e.g. spent on OCR)"""
+
+    @property
+    def is_upstream_failure(self) -> bool:
+        return False
+
+
+class GroqClient:
+    """Thin client for the Groq chat completions API"""
+
+    def __init__(self):
+        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
+        self.api_key = settings.GROQ_API_KEY
+        self.json_mode = settings.GROQ_JSON_MODE
+
+        # Recent time-to-first-byte samples (seconds), per (model, streamed).
+        # Non-streamed responses only start after the whole completion, so
+        # their first byte is total latency and is not comparable to streams.
+        self.ttfb_samples: Dict[Tuple[str, bool], Deque[float]] = defaultdict(lambda: deque(maxlen=200))
+
+        self.breaker = CircuitBreaker(
+            failure_ratio=settings.GROQ_BREAKER_FAILURE_RATIO,
+            min_calls=settings.GROQ_BREAKER_MIN_CALLS,
+            window_size=settings.GROQ_BREAKER_WINDOW,
+            slow_call_seconds=settings.GROQ_BREAKER_SLOW_CALL_MS / 1000,
+            reset_timeout=settings.GROQ_BREAKER_RESET_MS / 1000,
+            half_open_probes=settings.GROQ_BREAKER_HALF_OPEN_PROBES
+        )
+
+    def hedge_delay(self, model: str) -> float:
+        """
+        Get how long to wait for a first byte before hedging
+
+        Args:
+            model: Model of the call being hedged
+
+        Returns:
+            p95 of recent non-streamed time-to-first-byte samples for the
+            model, or the configured default until enough have been collected
+        """
+        samples = self.ttfb_samples[(model, False)]
+        if len(samples) < settings.GROQ_HEDGE_MIN_SAMPLES:
+            return settings.GROQ_HEDGE_DELAY_MS / 1000
+
+        ordered = sorted(samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        timeout: float,
+        json_mode: bool = True,
+        hedge: bool = False,
+        deadline: Optional[float] = None
+    ) -> str:
+        """
+        Run a chat completion and return the message content
+
+        Args:
+            messages: Chat messages to send
+            model: Model name
+            temperature: Sampling temperature
+            max_tokens: Maximum completion tokens
+            timeout: Request timeout in seconds
+            json_mode: Request a JSON object response when enabled in settings
+            hedge: Fire a second attempt if the first is slow to respond
+            deadline: Absolute time.monotonic() deadline for the whole call
+
+        Returns:
+            Message content text
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is rejecting calls
+            GroqAPIError: If the API call fails
+        """
+        payload = {
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "messages": messages
+        }
+        if json_mode and self.json_mode:
+            payload["response_format"] = {"type": "json_object"}
+
+        if deadline is None:
+            deadline = time.monotonic() + timeout
+        else:
+            deadline = min(deadline, time.monotonic() + timeout)
+
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            metrics.increment("groq.breaker_rejections")
+            raise
+
+        start_time = time.monotonic()
+        try:
+            with load_shedder.track():
+                if hedge and settings.GROQ_HEDGING_ENABLED:
+                    data = await self._hedged_request(payload, deadline)
+                else:
+                    data = await self._attempt(payload, deadline, asyncio.Event())
+        except GroqAPIError as e:
+            if e.is_upstream_failure:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_cancelled()
+            raise
+        except httpx.HTTPError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.record_cancelled()
+            raise
+
+        # Non-streamed latency includes the whole generation, so allow calls
+        # with longer timeouts (long normal-mode analyses) proportionally longer
+        slow_call_seconds = max(self.breaker.slow_call_seconds, timeout * settings.GROQ_BREAKER_SLOW_CALL_FRACTION)
+        self.breaker.record_success(time.monotonic() - start_time, slow_call_seconds)
+
+        usage = data.get("usage") or {}
+        metrics.increment("groq.prompt_tokens", usage.get("prompt_tokens", 0))
+        metrics.increment("groq.completion_tokens", usage.get("completion_tokens", 0))
+
+        return data.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+    async def _attempt(
+        self,
+        payload: Dict[str, Any],
+        deadline: float,
+        first_byte: asyncio.Event
+    ) -> Dict[str, Any]:
+        """Send a single request, setting first_byte once headers arrive"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise GroqDeadlineExceededError("Groq request deadline exceeded before sending")
+
+        model = payload["model"]
+        metrics.increment("groq.requests")
+        metrics.increment(f"groq.requests.{model}")
+        start_time = time.monotonic()
+
+        try:
+            async with asyncio.timeout(remaining):
+                async with httpx.AsyncClient(timeout=remaining) as client:
+                    async with client.stream(
+                        "POST",
+                        self.base_url,
+                        headers={
+                            "Content-Type": "application/json",
+                            "Authorization": f"Bearer {self.api_key}"
+                        },
+                        content=orjson.dumps(payload)
+                    ) as response:
+                        first_byte.set()
+                        self.ttfb_samples[(model, False)].append(time.monotonic() - start_time)
+                        await response.aread()
+        except (TimeoutError, httpx.TimeoutException):
+            metrics.increment("groq.errors")
+            metrics.increment(f"groq.errors.{model}")
+            raise GroqAPIError("Groq request deadline exceeded")
+
+        metrics.increment(f"groq.latency_ms.{model}", (time.monotonic() - start_time) * 1000)
+
+        if response.status_code != 200:
+            metrics.increment("groq.errors")
+            metrics.increment(f"groq.errors.{model}")
+            raise self._http_error(response)
+
+        data = orjson.loads(response.content)
+
+        if "error" in data:
+            metrics.increment("groq.errors")
+            metrics.increment(f"groq.errors.{model}")
+            raise GroqAPIError(data["error"].get("message", "Groq API error"), status_code=200)
+
+        return data
+
+    @staticmethod
+    def _http_error(response: httpx.Response) -> GroqAPIError:
+        """Build an error from a non-200 response whose body has been read"""
+        error_detail = response.text
+        error_code = None
+        try:
+            error_json = orjson.loads(response.content)
+            error_detail = error_json.get("error", {}).get("message", error_detail)
+            error_code = error_json.get("error", {}).get("code")
+        except Exception:
+            pass
+        return GroqAPIError(
+            f"Groq API HTTP {response.status_code}: {error_detail}",
+            status_code=response.status_code,
+            code=error_code
+        )
+
+    async def _hedged_request(self, payload: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+        """
+        Race a backup attempt against a slow primary attempt
+
+        The backup is only sent when the primary has produced no first byte
+        within the hedge delay. Whichever attempt succeeds first wins and
+        the other is cancelled.
+        """
+        first_byte = asyncio.Event()
+        primary = asyncio.create_task(self._attempt(payload, deadline, first_byte))
+        first_byte_waiter = asyncio.create_task(first_byte.wait())
+
+        delay = min(self.hedge_delay(payload["model"]), max(deadline - time.monotonic(), 0))
+        await asyncio.wait(
+            {primary, first_byte_waiter},
+            timeout=delay,
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        first_byte_waiter.cancel()
+
+        if first_byte.is_set() or primary.done():
+            return await primary
+
+        metrics.increment("groq.hedges")
+        hedge_payload = {**payload, "model": settings.GROQ_HEDGE_MODEL or payload["model"]}
+        backup = asyncio.create_task(self._attempt(hedge_payload, deadline, asyncio.Event()))
+
+        pending = {primary, backup}
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(deadline - time.monotonic(), 0),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise GroqAPIError("Groq request deadline exceeded")
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            metrics.increment("groq.hedge_wins")
+                        return task.result()
+                    last_error = task.exception()
+
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        timeout: float,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Run a streaming chat completion, yielding content as it arrives
+
+        Args:
+            messages: Chat messages to send
+            model: Model name
+            temperature: Sampling temperature
+            max_tokens: Maximum completion tokens
+            timeout: Request timeout in seconds
+            deadline: Absolute time.monotonic() deadline for the whole call
+
+        Yields:
+            Content deltas in order
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is rejecting calls
+            GroqAPIError: If the API call fails
+        """
+        payload = {
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "messages": messages,
+            "stream": True
+        }
+
+        if deadline is None:
+            deadline = time.monotonic() + timeout
+        else:
+            deadline = min(deadline, time.monotonic() + timeout)
+        if deadline <= time.monotonic():
+            raise GroqDeadlineExceededError("Groq request deadline exceeded before sending")
+
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            metrics.increment("groq.breaker_rejections")
+            raise
+
+        metrics.increment("groq.requests")
+        metrics.increment(f"groq.requests.{model}")
+        start_time = time.monotonic()
+        time_to_first_byte = None
+
+        try:
+            remaining = deadline - start_time
+            with load_shedder.track():
+                async with httpx.AsyncClient(timeout=remaining) as client:
+                    async with client.stream(
+                        "POST",
+                        self.base_url,
+                        headers={
+                            "Content-Type": "application/json",
+                            "Authorization": f"Bearer {self.api_key}"
+                        },
+                        content=orjson.dumps(payload)
+                    ) as response:
+                        time_to_first_byte = time.monotonic() - start_time
+                        self.ttfb_samples[(model, True)].append(time_to_first_byte)
+
+                        if response.status_code != 200:
+                            await response.aread()
+                            raise self._http_error(response)
+
+                        async for line in response.aiter_lines():
+                            if time.monotonic() > deadline:
+                                raise GroqAPIError("Groq request deadline exceeded")
+                            if not line.startswith("data:"):
+                                continue
+
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                break
+
+                            chunk = orjson.loads(data)
+                            if "error" in chunk:
+                                raise GroqAPIError(chunk["error"].get("message", "Groq API error"), status_code=200)
+
+                            # Groq reports usage on the final chunk under x_groq
+                            usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+                            if usage:
+                                metrics.increment("groq.prompt_tokens", usage.get("prompt_tokens", 0))
+                                metrics.increment("groq.completion_tokens", usage.get("completion_tokens", 0))
+
+                            choices = chunk.get("choices") or [{}]
+                            delta = (choices[0].get("delta") or {}).get("content")
+                            if delta:
+                                yield delta
+
+        except httpx.TimeoutException:
+            metrics.increment("groq.errors")
+            metrics.increment(f"groq.errors.{model}")
+            self.breaker.record_failure()
+            raise GroqAPIError("Groq request deadline exceeded")
+        except GroqAPIError as e:
+            metrics.increment("groq.errors")
+            metrics.increment(f"groq.errors.{model}")
+            if e.is_upstream_failure:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_cancelled()
+            raise
+        except httpx.HTTPError:
+            metrics.increment("groq.errors")
+            metrics.increment(f"groq.errors.{model}")
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Consumer stopped early or the task was cancelled
+            self.breaker.record_cancelled()
+            raise
+
+        metrics.increment(f"groq.latency_ms.{model}", (time.monotonic() - start_time) * 1000)
+        # Generation time depends on reply length, so judge upstream health by first byte
+        self.breaker.record_success(time_to_first_byte)
+
+    async def complete_json(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Type,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        timeout: float,
+        hedge: bool = False,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a JSON mode chat completion and validate it against a schema
+
+        Args:
+            messages: Chat messages to send
+            schema: Pydantic model the response must match
+            model: Model name
+            temperature: Sampling temperature
+            max_tokens: Maximum completion tokens
+            timeout: Request timeout in seconds
+            hedge: Fire a second attempt if the first is slow to respond
+            deadline: Absolute time.monotonic() deadline for the whole call
+
+        Returns:
+            Validated response dictionary
+
+        Raises:
+            ResponseParseError: If the response does not match the schema
+        """
+        content = await self.complete(
+            messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            hedge=hedge,
+            deadline=deadline
+        )
+
+        try:
+            return parse_response(content, schema)
+        except ResponseParseError:
+            metrics.increment("groq.parse_failures")
+            metrics.increment(f"groq.parse_failures.{model}")
+            raise
+
+
+# Global client instance
+groq_client = GroqClient()
@@ -0,0 +1,106 @@
+"""
+Model Router
+Routes each request class to the small fast model or the large model
+"""
+
+from typing import Dict, Any, AsyncIterator, List, Type
+
+from config.settings import settings, SMALL_MODEL_ROUTES
+from services.groq_client import groq_client, GroqAPIError
+from services.schemas import ResponseParseError
+from utils.metrics import metrics
+
+
+class ModelRouter:
+    """Pick a model per request class and input size, escalating on parse failure"""
+
+    def __init__(self):
+        self.client = groq_client
+        self.large_model = settings.GROQ_MODEL
+        self.small_model = settings.GROQ_MODEL_SMALL
+
+    def select_model(self, request_class: str, input_chars: int) -> str:
+        """
+        Select the model for a request
+
+        Args:
+            request_class: One of analysis, comparison, context, chat, ask
+            input_chars: Size of the variable input in characters
+
+        Returns:
+            Model name
+        """
+        if not settings.GROQ_ROUTING_ENABLED or not self.small_model:
+            return self.large_model
+
+        if request_class in SMALL_MODEL_ROUTES and input_chars <= settings.GROQ_SMALL_MODEL_MAX_CHARS:
+            return self.small_model
+
+        return self.large_model
+
+    async def complete_json(
+        self,
+        request_class: str,
+        input_chars: int,
+        messages: List[Dict[str, str]],
+        schema: Type,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Run a routed JSON completion
+
+        A response from the small model that fails schema validation, or
+        that Groq's JSON mode rejects as invalid JSON, is retried once on
+        the large model.
+
+        Args:
+            request_class: Request class used for routing
+            input_chars: Size of the variable input in characters
+            messages: Chat messages to send
+            schema: Pydantic model the response must match
+            **kwargs: Passed through to GroqClient.complete_json
+
+        Returns:
+            Validated response dictionary
+        """
+        model = self.select_model(request_class, input_chars)
+        metrics.increment(f"router.{request_class}.{model}")
+
+        try:
+            return await self.client.complete_json(messages, schema, model=model, **kwargs)
+        except (ResponseParseError, GroqAPIError) as e:
+            if model == self.large_model:
+                raise
+            if isinstance(e, GroqAPIError) and not e.is_json_validation_failure:
+                raise
+
+            print(f"⚠️  {model} returned invalid {request_class} response, escalating to {self.large_model}")
+            metrics.increment(f"router.escalations.{request_class}")
+            return await self.client.complete_json(messages, schema, model=self.large_model, **kwargs)
+
+    def stream(
+        self,
+        request_class: str,
+        input_chars: int,
+        messages: List[Dict[str, str]],
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        Run a routed streaming text completion
+
+        Args:
+            request_class: Request class used for routing
+            input_chars: Size of the variable input in characters
+            messages: Chat messages to send
+            **kwargs: Passed through to GroqClient.stream
+
+        Returns:
+            Async iterator of content deltas
+        """
+        model = self.select_model(request_class, input_chars)
+        metrics.increment(f"router.{request_class}.{model}")
+        return self.client.stream(messages, model=model, **kwargs)
+
+
+# Global router instance
+model_router = ModelRouter()
@@ -0,0 +1,91 @@
+"""
+OCR Loader
+Deferred import and construction of the OCR service
+"""
+
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .ocr_service import OCRService
+
+
+class OCRLoader:
+    """
+    Load the OCR service on first use, or ahead of time in the background
+
+    PIL, the Tesseract bindings and the tile worker pool are only imported
+    and created when an image request needs them or a warmup runs, keeping
+    them out of process start-up.
+    """
+
+    NOT_LOADED = "not_loaded"
+    LOADING = "loading"
+    READY = "ready"
+    UNAVAILABLE = "unavailable"
+
+    def __init__(self):
+        self.service: Optional["OCRService"] = None
+        self.status = self.NOT_LOADED
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._warmup: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        """Whether loading has finished, successfully or not"""
+        return self.status in (self.READY, self.UNAVAILABLE)
+
+    def load(self) -> Optional["OCRService"]:
+        """
+        Import and create the OCR service once (blocking)
+
+        Returns:
+            The OCR service, or None if OCR is not available on this server
+        """
+        if self.loaded:
+            return self.service
+
+        with self._lock:
+            if self.loaded:
+                return self.service
+
+            self.status = self.LOADING
+            try:
+                from .ocr_service import OCRService
+                self.service = OCRService()
+                self.status = self.READY
+                print(f"📷 OCR engine: {self.service.engine}")
+            except Exception as e:
+                self.error = str(e)
+                self.status = self.UNAVAILABLE
+                print(f"⚠️  OCR service not available: {e}")
+                print("📝 Manual text input will still work!")
+
+        return self.service
+
+    async def ensure_loaded(self) -> Optional["OCRService"]:
+        """Load the OCR service without blocking the event loop"""
+        if self.loaded:
+            return self.service
+        return await asyncio.to_thread(self.load)
+
+    def start_warmup(self) -> None:
+        """Start loading the OCR service in the background, if not already loaded"""
+        if self.loaded or (self._warmup is not None and not self._warmup.done()):
+            return
+        self.status = self.LOADING
+        self._warmup = asyncio.create_task(self.ensure_loaded())
+
+    def stats(self) -> dict:
+        """Get loader state"""
+        return {
+            "status": self.status,
+            "engine": self.service.engine if self.service else None,
+            "error": self.error
+        }
+
+
+# Global OCR loader
+ocr_loader = OCRLoader()
@@ -1,14 +1,55 @@
 """
 OCR Service
-Extracts text from images using pytesseract
+Extracts text from images using a persistent Tesseract engine (tesserocr)
+or the pytesseract CLI wrapper
 """
 
 import base64
+import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from typing import Optional
-from PIL import Image
-import pytesseract
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Tuple, Union
+from PIL import Image, ImageOps
+
+from config.settings import settings
+from utils.helpers import lexicon_hit_rate
+
+# tesserocr binds libtesseract in-process; pytesseract forks the tesseract CLI
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    tesserocr = None
+    TESSEROCR_AVAILABLE = False
+
+try:
+    import pytesseract
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    pytesseract = None
+    PYTESSERACT_AVAILABLE = False
+
+if not TESSEROCR_AVAILABLE and not PYTESSERACT_AVAILABLE:
+    raise ImportError("Neither tesserocr nor pytesseract is installed")
+
+
+# Mean grayscale level (0-255) above which a pixel row/column counts as blank
+BLANK_LEVEL = 250
+
+# Lexicon hit rate at which a scan counts as a fully readable ingredient list
+# (many real ingredients, e.g. chemical names, are not in the lexicon)
+LEXICON_TARGET_HIT_RATE = 0.3
+
+# Confidence score above which a scan is accepted whatever its vocabulary;
+# the lexicon is English-only, so clear labels in other languages miss it
+CLEAR_CONFIDENCE_SCORE = 0.75
+
+
+class OCRScan(NamedTuple):
+    text: str  # cleaned text
+    confidences: List[float]  # per-word confidence, 0-100
 
 
 class OCRService:
@@ -17,7 +58,39 @@ class OCRService:
     def __init__(self):
         # Configure pytesseract if needed
         # pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
-        pass
+        self.engine = self._select_engine(settings.OCR_ENGINE)
+
+        # One libtesseract handle per thread: the API object is not thread-safe,
+        # and each handle keeps its language model loaded between calls
+        self._local = threading.local()
+
+        # Pool for OCR'ing tiles of large images concurrently
+        self.workers = settings.OCR_WORKERS or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+
+    def _select_engine(self, requested: str) -> str:
+        """Resolve the OCR_ENGINE setting to an available engine"""
+        if requested in ("auto", "tesserocr") and TESSEROCR_AVAILABLE:
+            return "tesserocr"
+        if requested == "tesserocr":
+            print("⚠️  tesserocr not installed, falling back to pytesseract")
+        if not PYTESSERACT_AVAILABLE:
+            return "tesserocr"
+        return "pytesseract"
+
+    def _tess_api(self) -> "tesserocr.PyTessBaseAPI":
+        """Get this thread's persistent Tesseract handle, initializing it once"""
+        api = getattr(self._local, "api", None)
+        if api is None:
+            options = {
+                "lang": settings.OCR_LANG,
+                "psm": tesserocr.PSM.SINGLE_BLOCK  # same as --psm 6
+            }
+            if settings.OCR_TESSDATA_PATH:
+                options["path"] = settings.OCR_TESSDATA_PATH
+            api = tesserocr.PyTessBaseAPI(**options)
+            self._local.api = api
+        return api
 
     def extract_text_from_base64(self, base64_image: str) -> str:
         """
@@ -30,51 +103,292 @@ class OCRService:
             Extracted text from image
         """
         try:
-            # Remove data URI prefix if present
-            if ',' in base64_image:
-                base64_image = base64_image.split(',')[1]
+            return self.extract_text_from_image(self.load_base64(base64_image))
+
+        except Exception as e:
+            raise ValueError(f"OCR extraction failed: {str(e)}")
+
+    def load_base64(self, base64_image: str) -> Image.Image:
+        """
+        Decode a base64 image and normalize it for OCR
+
+        Args:
+            base64_image: Base64 encoded image (with or without data URI prefix)
+
+        Returns:
+            RGB or grayscale PIL image
+        """
+        # Remove data URI prefix if present
+        if ',' in base64_image:
+            base64_image = base64_image.split(',')[1]
+
+        # Decode base64 to image
+        return self.load_image(base64.b64decode(base64_image))
+
+    def load_image(self, image_data: Union[bytes, BinaryIO]) -> Image.Image:
+        """
+        Open an encoded image and normalize it for OCR
+
+        Args:
+            image_data: Encoded image bytes, or a seekable binary file
+                (e.g. a spooled upload) read directly without copying
+
+        Returns:
+            RGB or grayscale PIL image
+        """
+        source = BytesIO(image_data) if isinstance(image_data, bytes) else image_data
+
+        # Try to open image with error recovery
+        try:
+            image = Image.open(source)
+        except Exception as img_error:
+            # If JPEG fails, try with error tolerance
+            from PIL import ImageFile
+            ImageFile.LOAD_TRUNCATED_IMAGES = True
+            source.seek(0)
+            image = Image.open(source)
 
-            # Decode base64 to image
-            image_data = base64.b64decode(base64_image)
+        # Convert to RGB if necessary (this also fixes format issues)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image.mode == 'RGB':
+            # Re-encode as PNG to fix any JPEG corruption
+            buffer = BytesIO()
+            image.save(buffer, format='PNG')
+            buffer.seek(0)
+            image = Image.open(buffer)
+
+        # Enhance image quality for better OCR
+        # Optional: add preprocessing here if needed
+        # from PIL import ImageEnhance
+        # enhancer = ImageEnhance.Contrast(image)
+        # image = enhancer.enhance(2)
+
+        return image
+
+    def extract_text_from_image(self, image: Image.Image) -> str:
+        """
+        Extract and clean text from a loaded image
+
+        Args:
+            image: PIL image
+
+        Returns:
+            Cleaned extracted text
+        """
+        return self.scan_image(image).text
+
+    def scan_image(self, image: Image.Image) -> OCRScan:
+        """
+        Extract text and per-word confidences from a loaded image
 
-            # Try to open image with error recovery
+        Large or multi-column images are split into tiles that are OCR'd
+        concurrently on the worker pool and stitched back in reading order.
+
+        Args:
+            image: PIL image
+
+        Returns:
+            OCRScan with cleaned text and word confidences
+        """
+        tiles = self._plan_tiles(image) if settings.OCR_TILING_ENABLED else []
+        if len(tiles) <= 1:
+            text, confidences = self._recognize(image)
+            return OCRScan(self._clean_text(text), confidences)
+
+        futures = [
+            self.executor.submit(self._recognize, image.crop(box))
+            for box, _ in tiles
+        ]
+        results = [future.result() for future in futures]
+
+        text = self._stitch([text for text, _ in results], [overlapped for _, overlapped in tiles])
+        confidences = [confidence for _, tile_confidences in results for confidence in tile_confidences]
+        return OCRScan(self._clean_text(text), confidences)
+
+    def assess_quality(self, scan: OCRScan) -> Dict[str, float]:
+        """
+        Score how readable a scan is as an ingredient label
+
+        Based on Tesseract's word confidences (mean, and the share of words
+        below OCR_LOW_CONFIDENCE), so blurry or dark photos score low. How
+        many words are known ingredient-label words only lowers the score
+        of scans that are not clearly readable (below
+        CLEAR_CONFIDENCE_SCORE), where few hits suggest OCR noise.
+
+        Args:
+            scan: OCR result
+
+        Returns:
+            Dict with score (0-1) and its components
+        """
+        confidences = scan.confidences
+        if confidences:
+            mean_confidence = sum(confidences) / len(confidences)
+            low_ratio = sum(1 for c in confidences if c < settings.OCR_LOW_CONFIDENCE) / len(confidences)
+        else:
+            mean_confidence, low_ratio = 0.0, 1.0
+
+        hit_rate = lexicon_hit_rate(scan.text)
+        confidence_score = (mean_confidence / 100 + (1 - low_ratio)) / 2
+        lexicon_score = min(hit_rate / LEXICON_TARGET_HIT_RATE, 1.0)
+        penalty = (1 - lexicon_score) * max(CLEAR_CONFIDENCE_SCORE - confidence_score, 0.0)
+
+        return {
+            "score": round(max(confidence_score - penalty, 0.0), 3),
+            "confidenceScore": round(confidence_score, 3),
+            "lexiconScore": round(lexicon_score, 3),
+            "meanConfidence": round(mean_confidence, 1),
+            "lowConfidenceRatio": round(low_ratio, 3),
+            "lexiconHitRate": round(hit_rate, 3)
+        }
+
+    def _plan_tiles(self, image: Image.Image) -> List[Tuple[Tuple[int, int, int, int], bool]]:
+        """
+        Split an image into OCR tiles in reading order
+
+        Columns are found from blank vertical gutters; each column is then
+        cut into horizontal bands, at blank rows between text lines where
+        possible and with an overlap otherwise.
+
+        Returns:
+            List of ((left, top, right, bottom), overlaps_previous_tile)
+        """
+        width, height = image.size
+        gray = ImageOps.autocontrast(image.convert('L'))
+
+        columns = self._text_spans(
+            list(gray.resize((width, 1), Image.BOX).getdata()),
+            min_gap=max(width // 50, 8)
+        )
+        if not columns:
+            return []
+        if len(columns) == 1 and width * height < settings.OCR_TILE_MIN_PIXELS:
+            return []
+
+        # Aim for about one band per worker across all columns
+        band_height = max(height * len(columns) // self.workers, settings.OCR_TILE_MIN_HEIGHT)
+
+        tiles = []
+        for left, right in columns:
+            column = gray.crop((left, 0, right, height))
+            row_profile = list(column.resize((1, height), Image.BOX).getdata())
+            for top, bottom, overlapped in self._bands(row_profile, band_height):
+                tiles.append(((left, top, right, bottom), overlapped))
+        return tiles
+
+    def _text_spans(self, profile: List[int], min_gap: int) -> List[Tuple[int, int]]:
+        """Find spans of non-blank positions separated by blank runs of at least min_gap"""
+        spans = []
+        start = None
+        blank_run = 0
+
+        for position, level in enumerate(profile):
+            if level < BLANK_LEVEL:
+                if start is None:
+                    start = position
+                blank_run = 0
+            elif start is not None:
+                blank_run += 1
+                if blank_run >= min_gap:
+                    spans.append((start, position - blank_run + 1))
+                    start = None
+                    blank_run = 0
+
+        if start is not None:
+            spans.append((start, len(profile) - blank_run))
+
+        # Pad each span into the surrounding gutter so glyph edges are not clipped
+        pad = min_gap // 2
+        return [(max(begin - pad, 0), min(end + pad, len(profile))) for begin, end in spans]
+
+    def _bands(self, row_profile: List[int], band_height: int) -> List[Tuple[int, int, bool]]:
+        """Cut a column into bands of about band_height rows"""
+        height = len(row_profile)
+        overlap = settings.OCR_TILE_OVERLAP
+        search = band_height // 4
+
+        bands = []
+        top = 0
+        overlapped = False
+        while height - top > band_height * 1.5:
+            target = top + band_height
+            blank_rows = [
+                row for row in range(target - search, target + search)
+                if row_profile[row] >= BLANK_LEVEL
+            ]
+            if blank_rows:
+                cut = min(blank_rows, key=lambda row: abs(row - target))
+                bands.append((top, cut, overlapped))
+                top, overlapped = cut, False
+            else:
+                # No gap between lines here: overlap so the split line appears whole in one tile
+                bands.append((top, target + overlap, overlapped))
+                top, overlapped = target - overlap, True
+
+        bands.append((top, height, overlapped))
+        return bands
+
+    def _stitch(self, texts: List[str], overlapped: List[bool]) -> str:
+        """Join tile texts in order, dropping text repeated across overlapping tiles"""
+        parts = [texts[0]]
+        for text, overlaps_previous in zip(texts[1:], overlapped[1:]):
+            if overlaps_previous:
+                text = self._drop_repeated_prefix(parts[-1], text)
+            parts.append(text)
+        return "\n".join(parts)
+
+    def _drop_repeated_prefix(self, previous: str, text: str, max_words: int = 20) -> str:
+        """Remove the longest leading run of words that repeats the end of previous"""
+        previous_words = previous.split()
+        words = text.split()
+
+        for size in range(min(max_words, len(previous_words), len(words)), 0, -1):
+            tail = [word.lower() for word in previous_words[-size:]]
+            head = [word.lower() for word in words[:size]]
+            if tail == head:
+                return " ".join(words[size:])
+
+        return text
+
+    def _recognize(self, image: Image.Image) -> Tuple[str, List[float]]:
+        """Run the configured engine on an image, falling back to pytesseract"""
+        if self.engine == "tesserocr":
             try:
-                image = Image.open(BytesIO(image_data))
-            except Exception as img_error:
-                # If JPEG fails, try with error tolerance
-                from PIL import ImageFile
-                ImageFile.LOAD_TRUNCATED_IMAGES = True
-                image = Image.open(BytesIO(image_data))
-
-            # Convert to RGB if necessary (this also fixes format issues)
-            if image.mode not in ('RGB', 'L'):
-                image = image.convert('RGB')
-            elif image.mode == 'RGB':
-                # Re-encode as PNG to fix any JPEG corruption
-                buffer = BytesIO()
-                image.save(buffer, format='PNG')
-                buffer.seek(0)
-                image = Image.open(buffer)
-
-            # Enhance image quality for better OCR
-            # Optional: add preprocessing here if needed
-            # from PIL import ImageEnhance
-            # enhancer = ImageEnhance.Contrast(image)
-            # image = enhancer.enhance(2)
-
-            # Extract text using pytesseract
-            text = pytesseract.image_to_string(
-                image,
-                config='--psm 6'  # Assume uniform block of text
-            )
-
-            # Clean up extracted text
-            text = self._clean_text(text)
-
-            return text
+                api = self._tess_api()
+                api.SetImage(image)
+                text = api.GetUTF8Text()
+                return text, [float(confidence) for confidence in api.AllWordConfidences()]
+            except RuntimeError as e:
+                # Missing language data or a broken libtesseract install
+                if not PYTESSERACT_AVAILABLE:
+                    raise
+                print(f"⚠️  tesserocr failed ({str(e)}), falling back to pytesseract")
+                self.engine = "pytesseract"
 
-        except Exception as e:
-            raise ValueError(f"OCR extraction failed: {str(e)}")
+        # Extract words and confidences using pytesseract
+        data = pytesseract.image_to_data(
+            image,
+            lang=settings.OCR_LANG,
+            config='--psm 6',  # Assume uniform block of text
+            output_type=pytesseract.Output.DICT
+        )
+        return self._data_to_text(data)
+
+    def _data_to_text(self, data: Dict[str, list]) -> Tuple[str, List[float]]:
+        """Rebuild line text and word confidences from image_to_data output"""
+        lines: Dict[Tuple[int, int, int], List[str]] = {}
+        confidences = []
+
+        for index, word in enumerate(data["text"]):
+            confidence = float(data["conf"][index])
+            if confidence < 0 or not word.strip():
+                continue  # block/paragraph/line rows, not words
+            line = (data["block_num"][index], data["par_num"][index], data["line_num"][index])
+            lines.setdefault(line, []).append(word)
+            confidences.append(confidence)
+
+        return "\n".join(" ".join(words) for words in lines.values()), confidences
 
     def _clean_text(self, text: str) -> str:
         """
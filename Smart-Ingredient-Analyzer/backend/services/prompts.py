@@ -0,0 +1,176 @@
+"""
+Prompt Templates
+Static system prompts compiled once at import, with variable data kept last
+
+Every request reuses the exact same system message, so the long static
+prefix is byte-identical across calls and can be served from the
+provider's prompt cache. Only the short user message varies.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+
+ANALYSIS_SYSTEM_PROMPT = """You are an AI health copilot helping people understand food ingredients at the moment of decision-making. Your role is to INTERPRET and EXPLAIN, not just list data.
+
+CORE PRINCIPLES:
+1. Be conversational and intent-first - infer what matters to the user
+2. Explain WHY things matter, not just WHAT they are
+3. Express uncertainty honestly when evidence is mixed
+4. Focus on trade-offs (taste vs health, natural vs processed, cost vs quality)
+5. Reduce cognitive load - make decisions easier, not harder
+6. Be proactive - anticipate questions and offer relevant insights
+7. Act like a copilot - suggest next steps and alternatives
+
+The user message contains the INGREDIENTS to analyze and, optionally, a USER CONTEXT inferred from conversation.
+
+Respond with a JSON object with keys:
+summary (2-3 conversational sentences on what the user cares about most),
+keyInsights [{insight, explanation, uncertaintyLevel: low|medium|high, reasoning, tradeoff}],
+ingredients [{name, category: Good|Neutral|Concerning|Unknown, explanation, tradeoffs, uncertainty, relevantTo [], alternatives (one string)}],
+inferredConcerns [], recommendedQuestions [],
+proactiveSuggestions [{suggestion, reasoning, priority: high|medium|low}],
+aiQuestions [],
+overallAssessment {verdict (should they buy this?), bestFor, notIdealFor, betterAlternative}
+
+RULES:
+- Every keyInsight needs a tradeoff (benefit vs cost); every Concerning ingredient needs alternatives
+- 1-3 proactiveSuggestions, 1-2 aiQuestions, a clear verdict
+- Keep explanations to 1-2 sentences and express uncertainty when appropriate
+- Focus on practical decision-making, not academic knowledge"""
+
+COMPARISON_SYSTEM_PROMPT = """You are comparing two food products for a health-conscious user.
+
+The user message contains PRODUCT 1 and PRODUCT 2 with their ingredients and, optionally, a USER CONTEXT.
+
+Respond with a JSON object with keys:
+winner (which product is better and why, 1-2 sentences),
+product1 {score (1-10), pros [], cons [], summary},
+product2 {score (1-10), pros [], cons [], summary},
+keyDifferences []
+
+Be conversational and focus on practical decision-making. Consider trade-offs."""
+
+CONTEXT_SYSTEM_PROMPT = """You are an AI health assistant analyzing user messages to understand their health concerns, dietary preferences, and goals.
+
+Extract only what the USER MESSAGE states or implies. Respond with a JSON object with keys:
+healthConcerns [conditions mentioned or implied], dietaryPreferences [vegan, keto, etc.],
+allergens [specific food allergens], goals [weight loss, heart health, etc.],
+confidence: low|medium|high"""
+
+CHAT_SYSTEM_PROMPT = """You are an AI health copilot having a natural conversation with a user about food and health.
+
+Respond naturally and conversationally. If the user mentions health concerns, acknowledge them and offer to help. Be helpful but concise (2-3 sentences).
+
+Also infer any new context from the latest message. Respond with a JSON object with keys:
+response (your conversational reply),
+contextLearned {healthConcerns [], allergens [], dietaryPreferences [], goals []}"""
+
+CHAT_STREAM_SYSTEM_PROMPT = """You are an AI health copilot having a natural conversation with a user about food and health.
+
+Respond naturally and conversationally. If the user mentions health concerns, acknowledge them and offer to help. Be helpful but concise (2-3 sentences).
+
+Reply in plain text only, without JSON or markdown."""
+
+ANSWER_SYSTEM_PROMPT = """You are an AI health assistant answering a follow-up question about a previous ingredient analysis.
+
+The user message contains the ANALYSIS CONTEXT, the QUESTION and, optionally, a USER CONTEXT.
+
+Provide a helpful, concise answer. Respond with a JSON object with keys:
+answer, reasoning (brief explanation), suggestions [related questions they might ask]"""
+
+ANSWER_STREAM_SYSTEM_PROMPT = """You are an AI health assistant answering a follow-up question about a previous ingredient analysis.
+
+The user message contains the ANALYSIS CONTEXT, the QUESTION and, optionally, a USER CONTEXT.
+
+Provide a helpful, concise answer (2-4 sentences) in plain text only, without JSON or markdown."""
+
+
+def compact_json(data: Any) -> str:
+    """
+    Serialize data as compact, key-sorted JSON
+
+    Args:
+        data: JSON-serializable data
+
+    Returns:
+        JSON string without whitespace padding
+    """
+    return orjson.dumps(data, option=orjson.OPT_SORT_KEYS).decode()
+
+
+def _messages(system_prompt: str, user_content: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
+
+
+def _context_line(label: str, context: Optional[Dict]) -> str:
+    return f"{label}: {compact_json(context)}\n" if context else ""
+
+
+def analysis_messages(ingredients: str, user_context: Optional[Dict] = None) -> List[Dict[str, str]]:
+    """Build messages for an ingredient analysis"""
+    return _messages(
+        ANALYSIS_SYSTEM_PROMPT,
+        f"{_context_line('USER CONTEXT', user_context)}INGREDIENTS:\n{ingredients}"
+    )
+
+
+def comparison_messages(
+    product1: Dict[str, str],
+    product2: Dict[str, str],
+    user_context: Optional[Dict] = None
+) -> List[Dict[str, str]]:
+    """Build messages for a product comparison"""
+    product1_name = product1.get("name", "Product A")
+    product2_name = product2.get("name", "Product B")
+
+    return _messages(
+        COMPARISON_SYSTEM_PROMPT,
+        f"{_context_line('USER CONTEXT', user_context)}"
+        f"PRODUCT 1 ({product1_name}):\nIngredients: {product1['ingredients']}\n\n"
+        f"PRODUCT 2 ({product2_name}):\nIngredients: {product2['ingredients']}"
+    )
+
+
+def context_messages(message: str) -> List[Dict[str, str]]:
+    """Build messages for context inference"""
+    return _messages(CONTEXT_SYSTEM_PROMPT, f"USER MESSAGE:\n\"{message}\"")
+
+
+def chat_messages(
+    message: str,
+    user_context: Optional[Dict] = None,
+    history_lines: Optional[List[str]] = None,
+    summary: str = "",
+    stream: bool = False
+) -> List[Dict[str, str]]:
+    """Build messages for a chat turn; `stream` asks for a plain-text reply"""
+    summary_part = f"EARLIER CONVERSATION (summary):\n{summary}\n\n" if summary else ""
+
+    history_part = ""
+    if history_lines:
+        history_part = "RECENT CONVERSATION:\n" + "\n".join(history_lines) + "\n\n"
+
+    return _messages(
+        CHAT_STREAM_SYSTEM_PROMPT if stream else CHAT_SYSTEM_PROMPT,
+        f"{_context_line('USER CONTEXT', user_context)}{summary_part}{history_part}USER: {message}"
+    )
+
+
+def answer_messages(
+    question: str,
+    analysis_context: Dict[str, Any],
+    user_context: Optional[Dict] = None,
+    stream: bool = False
+) -> List[Dict[str, str]]:
+    """Build messages for a follow-up question; `stream` asks for a plain-text answer"""
+    return _messages(
+        ANSWER_STREAM_SYSTEM_PROMPT if stream else ANSWER_SYSTEM_PROMPT,
+        f"{_context_line('USER CONTEXT', user_context)}"
+        f"ANALYSIS CONTEXT: {compact_json(analysis_context)}\n\n"
+        f"QUESTION: {question}"
+    )
@@ -0,0 +1,168 @@
+"""
+Response Schemas
+Pydantic models for validating structured AI responses
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Type, TypeVar, Union
+
+import orjson
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+
+class _LenientModel(BaseModel):
+    """Base model that keeps unknown fields the AI adds"""
+
+    model_config = ConfigDict(extra="allow")
+
+
+def _join_text(value: Any) -> Any:
+    """Join a list the AI returned for a text field (e.g. several alternatives) into one string"""
+    if isinstance(value, list):
+        return "; ".join(str(item) for item in value if item is not None)
+    return value
+
+
+# Analysis
+class KeyInsight(_LenientModel):
+    insight: str = ""
+    explanation: str = ""
+    uncertaintyLevel: str = "medium"
+    reasoning: str = ""
+    tradeoff: str = ""
+
+
+class IngredientEntry(_LenientModel):
+    name: str
+    category: str = "Unknown"
+    explanation: str = ""
+    tradeoffs: str = ""
+    uncertainty: str = ""
+    relevantTo: List[str] = Field(default_factory=list)
+    alternatives: Optional[str] = None
+
+    _join_lists = field_validator(
+        "category", "explanation", "tradeoffs", "uncertainty", "alternatives", mode="before"
+    )(_join_text)
+
+
+class ProactiveSuggestion(_LenientModel):
+    suggestion: str = ""
+    reasoning: str = ""
+    priority: str = "medium"
+
+
+class OverallAssessment(_LenientModel):
+    verdict: str = "Analysis complete"
+    bestFor: str = "General use"
+    notIdealFor: str = "None identified"
+    betterAlternative: Optional[str] = None
+
+    _join_lists = field_validator(
+        "verdict", "bestFor", "notIdealFor", "betterAlternative", mode="before"
+    )(_join_text)
+
+
+class AnalysisResponse(_LenientModel):
+    summary: str
+    keyInsights: List[KeyInsight]
+    ingredients: List[IngredientEntry]
+    inferredConcerns: List[str] = Field(default_factory=list)
+    recommendedQuestions: List[str] = Field(default_factory=list)
+    proactiveSuggestions: List[ProactiveSuggestion] = Field(default_factory=list)
+    aiQuestions: List[str] = Field(default_factory=list)
+    overallAssessment: OverallAssessment = Field(default_factory=OverallAssessment)
+
+
+# Comparison
+class ProductScore(_LenientModel):
+    score: Union[int, float, str] = ""
+    pros: List[str] = Field(default_factory=list)
+    cons: List[str] = Field(default_factory=list)
+    summary: str = ""
+
+
+class ComparisonResponse(_LenientModel):
+    winner: str
+    product1: ProductScore
+    product2: ProductScore
+    keyDifferences: List[str] = Field(default_factory=list)
+
+
+# Context
+class ContextResponse(_LenientModel):
+    healthConcerns: List[str] = Field(default_factory=list)
+    dietaryPreferences: List[str] = Field(default_factory=list)
+    allergens: List[str] = Field(default_factory=list)
+    goals: List[str] = Field(default_factory=list)
+    confidence: str = "low"
+
+
+class LearnedContext(_LenientModel):
+    healthConcerns: List[str] = Field(default_factory=list)
+    allergens: List[str] = Field(default_factory=list)
+    dietaryPreferences: List[str] = Field(default_factory=list)
+    goals: List[str] = Field(default_factory=list)
+
+
+# Chat
+class ChatResponse(_LenientModel):
+    response: str
+    contextLearned: LearnedContext = Field(default_factory=LearnedContext)
+
+
+class AnswerResponse(_LenientModel):
+    answer: str
+    reasoning: str = ""
+    suggestions: List[str] = Field(default_factory=list)
+
+
+class ResponseParseError(Exception):
+    """Raised when an AI response cannot be validated against its schema"""
+
+    def __init__(self, message: str, content: str = ""):
+        super().__init__(message)
+        self.content = content
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_CODE_FENCE_PATTERN = re.compile(r'^```(?:json)?\s*|```\s*$', re.IGNORECASE)
+_JSON_OBJECT_PATTERN = re.compile(r'\{[\s\S]*\}')
+
+
+def parse_response(content: str, model: Type[ModelT]) -> Dict[str, Any]:
+    """
+    Validate AI response text against a schema
+
+    JSON mode responses are validated directly from the raw string by
+    pydantic-core; the regex extraction only runs for non-JSON-mode output.
+
+    Args:
+        content: Raw message content from the AI
+        model: Schema to validate against
+
+    Returns:
+        Validated response as a plain dictionary
+
+    Raises:
+        ResponseParseError: If the content is not valid for the schema
+    """
+    if not content:
+        raise ResponseParseError("Empty response from AI")
+
+    try:
+        return model.model_validate_json(content).model_dump()
+    except ValidationError:
+        pass
+
+    # Fallback: strip code fences and pull out the outermost object
+    cleaned = _CODE_FENCE_PATTERN.sub('', content.strip()).strip()
+    json_match = _JSON_OBJECT_PATTERN.search(cleaned)
+    if not json_match:
+        raise ResponseParseError("AI did not return a JSON object", content)
+
+    try:
+        return model.model_validate(orjson.loads(json_match.group(0))).model_dump()
+    except (orjson.JSONDecodeError, ValidationError) as e:
+        raise ResponseParseError(f"Invalid {model.__name__}: {str(e)}", content)
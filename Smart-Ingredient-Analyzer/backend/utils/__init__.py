@@ -3,22 +3,36 @@ Utility modules for Smart Food Analyzer
 """
 
 from .cache import analysis_cache, context_cache, SimpleCache
+from .metrics import metrics, Metrics
+from .context_extractor import extract_context
+from .session_store import session_store, SessionStore, SessionBackend
+from .job_queue import job_queue, JobQueue, JobQueueFullError
+from .load_shedder import load_shedder, LoadShedder, LoadSheddingMiddleware
+from .compression import CompressionMiddleware, precompressed_bodies
+from .uploads import UploadLimitMiddleware, spool_request_body
+from .request_metrics import RequestMetricsMiddleware
 from .validators import (
     validate_ingredients,
     validate_message,
     validate_question,
     validate_context,
     validate_comparison_request,
+    validate_callback_url,
     sanitize_text
 )
 from .helpers import (
     extract_ingredients,
+    lexicon_hit_rate,
     count_ingredients,
     categorize_ingredient,
     detect_allergens,
     estimate_processing_level,
     format_analysis_summary,
-    merge_user_context
+    merge_user_context,
+    build_rule_based_analysis,
+    normalize_message,
+    context_hash,
+    project_analysis
 )
 
 __all__ = [
@@ -27,20 +41,59 @@ __all__ = [
     'context_cache',
     'SimpleCache',
 
+    # Metrics
+    'metrics',
+    'Metrics',
+
+    # Sessions
+    'session_store',
+    'SessionStore',
+    'SessionBackend',
+
+    # Jobs
+    'job_queue',
+    'JobQueue',
+    'JobQueueFullError',
+
+    # Load shedding
+    'load_shedder',
+    'LoadShedder',
+    'LoadSheddingMiddleware',
+
+    # Compression
+    'CompressionMiddleware',
+    'precompressed_bodies',
+
+    # Uploads
+    'UploadLimitMiddleware',
+    'spool_request_body',
+
+    # Request metrics
+    'RequestMetricsMiddleware',
+
+    # Context extraction
+    'extract_context',
+
     # Validators
     'validate_ingredients',
     'validate_message',
     'validate_question',
     'validate_context',
     'validate_comparison_request',
+    'validate_callback_url',
     'sanitize_text',
 
     # Helpers
     'extract_ingredients',
+    'lexicon_hit_rate',
     'count_ingredients',
     'categorize_ingredient',
     'detect_allergens',
     'estimate_processing_level',
     'format_analysis_summary',
     'merge_user_context',
+    'build_rule_based_analysis',
+    'normalize_message',
+    'context_hash',
+    'project_analysis',
 ]
@@ -3,29 +3,146 @@ Cache Utility
 Simple in-memory caching for API responses
 """
 
-from typing import Any, Optional
-from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
 import hashlib
-import json
+import time
+import zlib
+
+import orjson
+
+
+def _analysis_dictionary() -> bytes:
+    """
+    Preset zlib dictionary for serialized analysis results
+
+    Analyses are small (a few KB), so most of their redundancy is with
+    each other rather than within one blob: the same keys, category
+    names and stock phrases. Priming zlib with them lets every entry
+    back-reference them instead of spelling them out.
+    """
+    skeleton = {
+        "analysisId": "",
+        "ingredientsText": "",
+        "productName": "Manual Input",
+        "analysis": {
+            "summary": "This product contains added sugar and is highly processed",
+            "keyInsights": [{
+                "insight": "", "explanation": "", "uncertaintyLevel": "medium",
+                "reasoning": "", "tradeoff": "Better taste and shelf life, but"
+            }],
+            "ingredients": [
+                {"name": "", "category": "Concerning", "explanation": "", "tradeoffs": "",
+                 "uncertainty": "", "relevantTo": [], "alternatives": ""},
+                {"name": "", "category": "Neutral", "explanation": "", "tradeoffs": "",
+                 "uncertainty": "low", "relevantTo": [], "alternatives": ""},
+                {"name": "", "category": "Good", "explanation": "", "tradeoffs": "",
+                 "uncertainty": "high", "relevantTo": [], "alternatives": None},
+            ],
+            "inferredConcerns": [],
+            "recommendedQuestions": ["Is this suitable for"],
+            "proactiveSuggestions": [{"suggestion": "", "reasoning": "", "priority": "high"}],
+            "aiQuestions": ["Are you"],
+            "overallAssessment": {"verdict": "", "bestFor": "", "notIdealFor": "", "betterAlternative": ""}
+        },
+        "processingTime": 0.0,
+        "fastMode": True,
+        "isMobile": False,
+        "aiTime": 0.0,
+        "inputMethod": "manual"
+    }
+    # zlib favors the end of the dictionary, so common phrases go last
+    phrases = (
+        " sugar, salt, water, natural flavors, citric acid, preservative, artificial, "
+        "sodium, protein, fiber, calories, blood sugar, heart health, weight loss, "
+        "processed, moderation, whole grain, healthier alternative, may cause, "
+        "generally recognized as safe, studies suggest, in small amounts, if you are "
+    )
+    return phrases.encode() + orjson.dumps(skeleton)
+
+
+ANALYSIS_ZDICT = _analysis_dictionary()
+
+
+class CacheEntry:
+    """A cached value with monotonic soft and hard expiry times"""
+
+    __slots__ = ('value', 'expires', 'hard_expires')
+
+    def __init__(self, value: Any, expires: float, hard_expires: float):
+        self.value = value
+        self.expires = expires
+        self.hard_expires = hard_expires
 
 
 class SimpleCache:
-    """Simple in-memory cache with TTL support"""
+    """
+    Simple in-memory cache with TTL support
+
+    Entries are fresh until `ttl_seconds` (the soft TTL). Between the soft
+    and hard TTL they are stale: get() ignores them, but get_with_state()
+    and get_stale() still return them so callers can serve the stale value
+    while refreshing it. Past the hard TTL they are dropped.
 
-    def __init__(self, ttl_seconds: int = 300):
+    With `compress`, values must be bytes and are stored zlib-compressed
+    (optionally against a preset dictionary), then decompressed on hit.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = 300,
+        hard_ttl_seconds: Optional[int] = None,
+        compress: bool = False,
+        zdict: Optional[bytes] = None
+    ):
         """
         Initialize cache
 
         Args:
-            ttl_seconds: Time to live in seconds (default 5 minutes)
+            ttl_seconds: Soft time to live in seconds (default 5 minutes)
+            hard_ttl_seconds: Hard time to live in seconds (defaults to ttl_seconds)
+            compress: Store bytes values zlib-compressed
+            zdict: Preset compression dictionary shared by all entries
         """
-        self.cache = {}
+        self.cache: Dict[str, CacheEntry] = {}
         self.ttl_seconds = ttl_seconds
+        self.hard_ttl_seconds = max(hard_ttl_seconds or ttl_seconds, ttl_seconds)
+        self.refreshing: Dict[str, asyncio.Task] = {}
+        self.compress = compress
+        self.zdict = zdict
 
     def _generate_key(self, data: Any) -> str:
         """Generate cache key from data"""
-        json_str = json.dumps(data, sort_keys=True)
-        return hashlib.md5(json_str.encode()).hexdigest()
+        return hashlib.md5(orjson.dumps(data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def _encode(self, value: Any) -> Any:
+        if not self.compress:
+            return value
+        if self.zdict:
+            compressor = zlib.compressobj(zdict=self.zdict)
+            return compressor.compress(value) + compressor.flush()
+        return zlib.compress(value)
+
+    def _decode(self, value: Any) -> Any:
+        if not self.compress:
+            return value
+        if self.zdict:
+            decompressor = zlib.decompressobj(zdict=self.zdict)
+            return decompressor.decompress(value) + decompressor.flush()
+        return zlib.decompress(value)
+
+    def _lookup(self, key: str) -> Tuple[Optional[Any], bool]:
+        """Get (value, is_stale) for a key, dropping it past the hard TTL"""
+        entry = self.cache.get(key)
+        if entry is None:
+            return None, False
+
+        now = time.monotonic()
+        if now > entry.hard_expires:
+            del self.cache[key]
+            return None, False
+
+        return self._decode(entry.value), now > entry.expires
 
     def get(self, key_data: Any) -> Optional[Any]:
         """
@@ -37,19 +154,71 @@ class SimpleCache:
         Returns:
             Cached value if exists and not expired, None otherwise
         """
-        key = self._generate_key(key_data)
+        value, is_stale = self._lookup(self._generate_key(key_data))
+        return None if is_stale else value
 
-        if key not in self.cache:
-            return None
+    def key_for(self, key_data: Any) -> str:
+        """
+        Get the stable cache key for data
 
-        entry = self.cache[key]
+        The key can be handed to clients as a handle and looked up later
+        with get_by_key().
 
-        # Check if expired
-        if datetime.now() > entry['expires']:
-            del self.cache[key]
-            return None
+        Args:
+            key_data: Data to generate cache key from
+
+        Returns:
+            Cache key
+        """
+        return self._generate_key(key_data)
 
-        return entry['value']
+    def get_by_key(self, key: str) -> Optional[Any]:
+        """
+        Get value by cache key, including stale values
+
+        Args:
+            key: Cache key from key_for()
+
+        Returns:
+            Cached value if within the hard TTL, None otherwise
+        """
+        return self._lookup(key)[0]
+
+    def get_by_key_with_state(self, key: str) -> Tuple[Optional[Any], bool]:
+        """
+        Get value by cache key, including stale values
+
+        Args:
+            key: Cache key from key_for()
+
+        Returns:
+            Tuple of (value, is_stale); value is None past the hard TTL
+        """
+        return self._lookup(key)
+
+    def get_with_state(self, key_data: Any) -> Tuple[Optional[Any], bool]:
+        """
+        Get value from cache, including stale values
+
+        Args:
+            key_data: Data to generate cache key from
+
+        Returns:
+            Tuple of (value, is_stale); value is None past the hard TTL
+        """
+        return self._lookup(self._generate_key(key_data))
+
+    def get_stale(self, key_data: Any) -> Optional[Any]:
+        """
+        Get value from cache even if it is stale
+
+        Args:
+            key_data: Data to generate cache key from
+
+        Returns:
+            Cached value if within the hard TTL, None otherwise
+        """
+        return self.get_with_state(key_data)[0]
 
     def set(self, key_data: Any, value: Any) -> None:
         """
@@ -60,27 +229,62 @@ class SimpleCache:
             value: Value to cache
         """
         key = self._generate_key(key_data)
+        now = time.monotonic()
 
-        self.cache[key] = {
-            'value': value,
-            'expires': datetime.now() + timedelta(seconds=self.ttl_seconds)
-        }
+        self.cache[key] = CacheEntry(
+            self._encode(value),
+            now + self.ttl_seconds,
+            now + self.hard_ttl_seconds
+        )
+
+    def refresh_in_background(
+        self,
+        key_data: Any,
+        refresh: Callable[[], Awaitable[Any]]
+    ) -> bool:
+        """
+        Recompute a value in a background task, at most once per key
+
+        Args:
+            key_data: Data to generate cache key from
+            refresh: Coroutine factory producing the new value
+
+        Returns:
+            True if a refresh was started, False if one is already running
+        """
+        key = self._generate_key(key_data)
+        if key in self.refreshing:
+            return False
+
+        async def run_refresh():
+            try:
+                self.set(key_data, await refresh())
+            except Exception as e:
+                print(f"⚠️  Background cache refresh failed: {str(e)}")
+            finally:
+                self.refreshing.pop(key, None)
+
+        self.refreshing[key] = asyncio.create_task(run_refresh())
+        return True
 
     def clear(self) -> None:
         """Clear all cache entries"""
+        for task in self.refreshing.values():
+            task.cancel()
+        self.refreshing.clear()
         self.cache.clear()
 
     def cleanup_expired(self) -> int:
         """
-        Remove expired entries
+        Remove entries past their hard TTL
 
         Returns:
             Number of entries removed
         """
-        now = datetime.now()
+        now = time.monotonic()
         expired_keys = [
             key for key, entry in self.cache.items()
-            if now > entry['expires']
+            if now > entry.hard_expires
         ]
 
         for key in expired_keys:
@@ -91,16 +295,21 @@ class SimpleCache:
     def stats(self) -> dict:
         """Get cache statistics"""
         total = len(self.cache)
-        now = datetime.now()
-        expired = sum(1 for entry in self.cache.values() if now > entry['expires'])
+        now = time.monotonic()
+        expired = sum(1 for entry in self.cache.values() if now > entry.expires)
 
-        return {
+        stats = {
             'total_entries': total,
             'valid_entries': total - expired,
-            'expired_entries': expired
+            'expired_entries': expired,
+            'refreshing': len(self.refreshing)
         }
+        if self.compress:
+            stats['stored_bytes'] = sum(len(entry.value) for entry in self.cache.values())
+        return stats
 
 
 # Global cache instances
-analysis_cache = SimpleCache(ttl_seconds=300)  # 5 minutes
+# 5 minutes fresh, stale up to 1 hour; values are serialized analysis JSON
+analysis_cache = SimpleCache(ttl_seconds=300, hard_ttl_seconds=3600, compress=True, zdict=ANALYSIS_ZDICT)
 context_cache = SimpleCache(ttl_seconds=600)   # 10 minutes
@@ -0,0 +1,144 @@
+"""
+Circuit Breaker
+Fast-fails calls to an unhealthy upstream instead of waiting out timeouts
+"""
+
+import time
+from collections import deque
+from typing import Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("AI service is temporarily unavailable")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker
+
+    The circuit opens when at least `min_calls` of the last `window_size`
+    calls were recorded and the share of failed or slow calls reaches
+    `failure_ratio`. After `reset_timeout` seconds it half-opens and lets
+    up to `half_open_probes` calls through; a successful probe closes the
+    circuit and a failed one opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_ratio: float = 0.5,
+        min_calls: int = 10,
+        window_size: int = 20,
+        slow_call_seconds: float = 8.0,
+        reset_timeout: float = 30.0,
+        half_open_probes: int = 2
+    ):
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+
+        self.outcomes = deque(maxlen=window_size)  # True = failed or slow
+        self._state = self.CLOSED
+        self.opened_at: Optional[float] = None
+        self.probes_in_flight = 0
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the reset timeout passes"""
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self.probes_in_flight = 0
+        return self._state
+
+    def before_call(self) -> None:
+        """
+        Admit a call or reject it
+
+        Raises:
+            CircuitOpenError: If the circuit is open or all probe slots are taken
+        """
+        state = self.state
+
+        if state == self.OPEN:
+            raise CircuitOpenError(self.reset_timeout - (time.monotonic() - self.opened_at))
+
+        if state == self.HALF_OPEN:
+            if self.probes_in_flight >= self.half_open_probes:
+                raise CircuitOpenError(1.0)
+            self.probes_in_flight += 1
+
+    def record_success(self, latency: float, slow_call_seconds: Optional[float] = None) -> None:
+        """
+        Record a completed call and its latency in seconds
+
+        Args:
+            latency: Call latency in seconds
+            slow_call_seconds: Slow-call threshold for this call, if it differs
+                from the breaker default (e.g. for calls with longer timeouts)
+        """
+        if latency > (slow_call_seconds or self.slow_call_seconds):
+            self._record(failed=True)
+        elif self._state == self.HALF_OPEN:
+            self._close()
+        else:
+            self._record(failed=False)
+
+    def record_failure(self) -> None:
+        """Record a failed call"""
+        self._record(failed=True)
+
+    def record_cancelled(self) -> None:
+        """Release a probe slot for a call that finished without an outcome"""
+        if self._state == self.HALF_OPEN and self.probes_in_flight > 0:
+            self.probes_in_flight -= 1
+
+    def _record(self, failed: bool) -> None:
+        if self._state == self.HALF_OPEN:
+            if failed:
+                self._open()
+            else:
+                self._close()
+            return
+
+        self.outcomes.append(failed)
+        if len(self.outcomes) >= self.min_calls:
+            if sum(self.outcomes) / len(self.outcomes) >= self.failure_ratio:
+                self._open()
+
+    def _open(self) -> None:
+        if self._state != self.OPEN:
+            print("🔴 Circuit breaker opened - failing fast")
+        self._state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.probes_in_flight = 0
+
+    def _close(self) -> None:
+        print("🟢 Circuit breaker closed - upstream healthy again")
+        self._state = self.CLOSED
+        self.opened_at = None
+        self.probes_in_flight = 0
+        self.outcomes.clear()
+
+    def stats(self) -> dict:
+        """Get breaker state for health reporting"""
+        state = self.state
+        failures = sum(self.outcomes)
+
+        return {
+            'state': state,
+            'recent_calls': len(self.outcomes),
+            'recent_failures': failures,
+            'retry_after': (
+                max(self.reset_timeout - (time.monotonic() - self.opened_at), 0)
+                if state == self.OPEN else 0
+            )
+        }
@@ -0,0 +1,173 @@
+"""
+Response Compression
+gzip/brotli negotiation, a compression middleware and precompressed bodies
+"""
+
+import gzip
+import hashlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.settings import settings
+from .cache import SimpleCache
+from .metrics import metrics
+
+# Brotli is optional; gzip is always available
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick a response encoding from an Accept-Encoding header
+
+    Args:
+        accept_encoding: Accept-Encoding header value
+
+    Returns:
+        "br", "gzip", or None if neither is acceptable
+    """
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    wildcard = accepted.get("*", 0)
+    if BROTLI_AVAILABLE and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    Compress a response body
+
+    Args:
+        body: Uncompressed body
+        encoding: "br" or "gzip"
+
+    Returns:
+        Compressed body
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # mtime=0 keeps output deterministic for identical bodies
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class PrecompressedBodies:
+    """Compressed copies of hot response bodies, keyed by content and encoding"""
+
+    def __init__(self, ttl_seconds: int):
+        self.cache = SimpleCache(ttl_seconds=ttl_seconds)
+
+    def get(self, body: bytes, encoding: str) -> bytes:
+        """
+        Get the compressed body, compressing it on first use
+
+        Args:
+            body: Uncompressed body
+            encoding: "br" or "gzip"
+
+        Returns:
+            Compressed body
+        """
+        key_data = {"body": hashlib.md5(body).hexdigest(), "encoding": encoding}
+        compressed = self.cache.get(key_data)
+        if compressed is None:
+            compressed = compress(body, encoding)
+            self.cache.set(key_data, compressed)
+            metrics.increment("compression.precompressed_misses")
+        else:
+            metrics.increment("compression.precompressed_hits")
+        return compressed
+
+
+class CompressionMiddleware:
+    """
+    Compress buffered JSON and text responses for clients that accept it
+
+    Responses below `minimum_size`, already encoded responses (such as
+    precompressed cache hits) and streamed responses are sent unchanged.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        body_parts = []
+        streaming = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, streaming
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or streaming:
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                # Streamed response: pass it through as is
+                streaming = True
+                await send(start_message)
+                await send({"type": "http.response.body", "body": b"".join(body_parts), "more_body": True})
+                return
+
+            body = b"".join(body_parts)
+            headers = MutableHeaders(raw=start_message["headers"])
+            if self._should_compress(headers, body):
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                metrics.increment(f"compression.{encoding}")
+
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _should_compress(self, headers: MutableHeaders, body: bytes) -> bool:
+        content_type = headers.get("content-type", "")
+        return (
+            len(body) >= self.minimum_size
+            and "content-encoding" not in headers
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+            and not content_type.startswith("text/event-stream")
+        )
+
+
+# Precompressed bodies for cached analyses, kept as long as they stay fresh
+precompressed_bodies = PrecompressedBodies(ttl_seconds=300)
@@ -0,0 +1,248 @@
+"""
+Context Extractor
+Local, rule-based user context extraction for unambiguous messages
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from .helpers import ALLERGEN_KEYWORDS
+
+
+# Phrase -> canonical value. Longer phrases are matched first.
+DIET_PHRASES = {
+    'vegan': 'vegan',
+    'vegetarian': 'vegetarian',
+    'pescatarian': 'pescatarian',
+    'keto': 'keto',
+    'ketogenic': 'keto',
+    'paleo': 'paleo',
+    'gluten free': 'gluten-free',
+    'gluten-free': 'gluten-free',
+    'dairy free': 'dairy-free',
+    'dairy-free': 'dairy-free',
+    'low carb': 'low-carb',
+    'low-carb': 'low-carb',
+    'halal': 'halal',
+    'kosher': 'kosher',
+    'plant based': 'plant-based',
+    'plant-based': 'plant-based',
+}
+
+HEALTH_PHRASES = {
+    'diabetes': 'diabetes',
+    'diabetic': 'diabetes',
+    'prediabetic': 'prediabetes',
+    'prediabetes': 'prediabetes',
+    'high blood pressure': 'high blood pressure',
+    'hypertension': 'high blood pressure',
+    'high cholesterol': 'high cholesterol',
+    'cholesterol': 'high cholesterol',
+    'heart disease': 'heart disease',
+    'celiac': 'celiac disease',
+    'coeliac': 'celiac disease',
+    'ibs': 'IBS',
+    'acid reflux': 'acid reflux',
+    'gerd': 'acid reflux',
+    'kidney disease': 'kidney disease',
+    'pregnant': 'pregnancy',
+    'pcos': 'PCOS',
+    'gout': 'gout',
+}
+
+GOAL_PHRASES = {
+    'lose weight': 'weight loss',
+    'losing weight': 'weight loss',
+    'weight loss': 'weight loss',
+    'build muscle': 'muscle gain',
+    'gain muscle': 'muscle gain',
+    'muscle gain': 'muscle gain',
+    'heart health': 'heart health',
+    'eat healthier': 'eat healthier',
+    'eat clean': 'eat healthier',
+    'cut sugar': 'reduce sugar',
+    'less sugar': 'reduce sugar',
+    'reduce sugar': 'reduce sugar',
+    'low sodium': 'reduce sodium',
+    'less salt': 'reduce sodium',
+    'more protein': 'more protein',
+}
+
+# Allergen words as people say them, on top of the ingredient keywords
+ALLERGEN_PHRASES = {
+    keyword: allergen
+    for allergen, keywords in ALLERGEN_KEYWORDS.items()
+    for keyword in keywords
+}
+ALLERGEN_PHRASES.update({
+    'nuts': 'tree nuts',
+    'tree nuts': 'tree nuts',
+    'tree nut': 'tree nuts',
+    'peanuts': 'peanuts',
+    'eggs': 'eggs',
+    'shellfish': 'shellfish',
+    'seafood': 'shellfish',
+    'sesame': 'sesame',
+})
+
+NEGATION_WORDS = {'not', 'no', "don't", 'dont', "doesn't", "isn't", "aren't", 'never', 'without', 'longer', 'nor'}
+HEDGE_WORDS = {'maybe', 'might', 'think', 'probably', 'sometimes', 'possibly', 'unsure', 'perhaps', 'kinda', 'bit'}
+ALLERGY_CUES = re.compile(
+    r"\b(allerg\w*|intoleran\w*|sensitive to|sensitivity|can'?t (?:eat|have)|cannot (?:eat|have)|react to)\b"
+)
+# Where the object of an allergy cue ends: a new clause, or "and"/"or"
+# starting a new statement rather than continuing the list of allergens
+ALLERGY_OBJECT_END = re.compile(
+    r"\b(?:and|or)\s+(?:i|i'm|im|i've|ive|i'd|my|me|we|you|he|she|they|it|this|that)\b|"
+    r"\b(?:but|so|because|since|while|although|though|when|which|who|if|unless|except)\b"
+)
+# Words before a cue that can name the allergen ("peanut allergy", "lactose intolerant")
+ALLERGY_MODIFIER_WORDS = 2
+# Words that suggest health information the lexicon cannot interpret
+UNKNOWN_HEALTH_CUES = re.compile(
+    r'\b(condition|disease|disorder|syndrome|doctor|diagnosed|medication|deficien\w*|diet)\b'
+)
+
+# Sentences that only mention a diet or condition rather than state the user's own
+QUESTION_START = re.compile(
+    r"^(is|are|am|does|do|did|can|could|should|would|will|was|were|has|have|"
+    r"which|what|how|why|whether|any)\b"
+)
+OTHER_SUBJECTS = re.compile(
+    r"\b(he|she|they|we|you|it|this|that|these|those|his|her|their|our|your|someone|"
+    r"somebody|everyone|people|"
+    r"my (?:friend|friends|wife|husband|partner|son|daughter|kid|kids|child|children|baby|"
+    r"mom|mum|mother|dad|father|brother|sister|family|boyfriend|girlfriend|roommate|parents?|"
+    r"grand\w+|aunt|uncle|cousin|guest|guests|doctor))\b"
+)
+PAST_TENSE = re.compile(r"\b(used to|was|were|had|formerly|previously|anymore)\b")
+
+_SENTENCE = re.compile(r'[^.;!?\n]+[.;!?\n]*')
+_CLAUSE_SPLIT = re.compile(r'[.;!?\n]+|,|\bbut\b')
+_WORD = re.compile(r"[a-z']+")
+
+
+def _compile(phrases: Dict[str, str]) -> re.Pattern:
+    ordered = sorted(phrases, key=len, reverse=True)
+    return re.compile(r'\b(' + '|'.join(re.escape(p) for p in ordered) + r')s?\b')
+
+
+DIET_PATTERN = _compile(DIET_PHRASES)
+HEALTH_PATTERN = _compile(HEALTH_PHRASES)
+GOAL_PATTERN = _compile(GOAL_PHRASES)
+ALLERGEN_PATTERN = _compile(ALLERGEN_PHRASES)
+
+
+def _is_negated(clause: str, position: int) -> bool:
+    """Check for a negation word among the three words before position"""
+    preceding = _WORD.findall(clause[:position])[-3:]
+    return any(word in NEGATION_WORDS for word in preceding)
+
+
+def _matches(pattern: re.Pattern, phrases: Dict[str, str], clause: str) -> List[str]:
+    values = []
+    for match in pattern.finditer(clause):
+        if not _is_negated(clause, match.start()):
+            values.append(phrases[match.group(1)])
+    return values
+
+
+def _allergy_phrases(clause: str, cue: re.Match) -> str:
+    """
+    Get the text naming what an allergy cue refers to
+
+    That is the object after the cue ("allergic to nuts and eggs") up to
+    the next statement, plus the words right before it ("peanut allergy"),
+    so allergen words elsewhere in the clause ("I love cheese") are not
+    taken as allergies.
+    """
+    after = clause[cue.end():]
+    end = ALLERGY_OBJECT_END.search(after)
+    if end:
+        after = after[:end.start()]
+
+    before = clause[:cue.start()]
+    starts = [match.end() for match in ALLERGY_OBJECT_END.finditer(before)]
+    if starts:
+        before = before[starts[-1]:]
+    modifiers = before.split()[-ALLERGY_MODIFIER_WORDS:]
+
+    return ' '.join(modifiers) + ' ' + after
+
+
+def _append_unique(items: List[str], values: List[str]) -> None:
+    for value in values:
+        if value not in items:
+            items.append(value)
+
+
+def extract_context(message: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract user context from a message without calling the AI
+
+    Only present-tense statements about the user themselves are high
+    confidence. Matches in questions ("is this vegan?"), in sentences about
+    someone else ("my friend is keto") or in the past tense ("I used to be
+    vegan") make the result ambiguous, so callers escalate to the AI.
+
+    Args:
+        message: User message
+
+    Returns:
+        Context dictionary with a confidence level, or None if nothing
+        recognizable was found
+    """
+    context = {
+        'healthConcerns': [],
+        'dietaryPreferences': [],
+        'allergens': [],
+        'goals': []
+    }
+    ambiguous = False
+
+    for sentence in _SENTENCE.findall(message.lower()):
+        sentence = sentence.strip()
+        not_about_user = bool(
+            sentence.endswith('?')
+            or QUESTION_START.match(sentence)
+            or OTHER_SUBJECTS.search(sentence)
+            or PAST_TENSE.search(sentence)
+        )
+
+        for clause in _CLAUSE_SPLIT.split(sentence):
+            clause = clause.strip()
+            if not clause:
+                continue
+
+            words = set(_WORD.findall(clause))
+            if words & HEDGE_WORDS:
+                ambiguous = True
+
+            found = (
+                _matches(DIET_PATTERN, DIET_PHRASES, clause),
+                _matches(HEALTH_PATTERN, HEALTH_PHRASES, clause),
+                _matches(GOAL_PATTERN, GOAL_PHRASES, clause)
+            )
+            _append_unique(context['dietaryPreferences'], found[0])
+            _append_unique(context['healthConcerns'], found[1])
+            _append_unique(context['goals'], found[2])
+            if any(found) and not_about_user:
+                ambiguous = True
+
+            # Allergen words only count next to an allergy cue ("allergic to", "intolerant")
+            cue = ALLERGY_CUES.search(clause)
+            if cue:
+                if _is_negated(clause, cue.start()):
+                    continue
+                allergens = _matches(ALLERGEN_PATTERN, ALLERGEN_PHRASES, _allergy_phrases(clause, cue))
+                if not allergens or not_about_user:
+                    ambiguous = True
+                _append_unique(context['allergens'], allergens)
+            elif UNKNOWN_HEALTH_CUES.search(clause) and not any(found):
+                ambiguous = True
+
+    if not any(context.values()):
+        return None
+
+    context['confidence'] = 'medium' if ambiguous else 'high'
+    return context
@@ -3,9 +3,90 @@ Helper Utilities
 Common helper functions for analysis and processing
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import hashlib
 import re
 
+import orjson
+
+
+# Common allergens and the ingredient keywords that indicate them
+ALLERGEN_KEYWORDS = {
+    'milk': ['milk', 'dairy', 'whey', 'casein', 'lactose', 'butter', 'cheese', 'cream'],
+    'eggs': ['egg', 'albumin', 'mayonnaise'],
+    'fish': ['fish', 'anchovy', 'bass', 'cod', 'salmon', 'tuna'],
+    'shellfish': ['shellfish', 'crab', 'lobster', 'shrimp', 'prawn'],
+    'tree nuts': ['almond', 'cashew', 'walnut', 'pecan', 'pistachio', 'hazelnut'],
+    'peanuts': ['peanut', 'groundnut'],
+    'wheat': ['wheat', 'flour', 'gluten'],
+    'soy': ['soy', 'soya', 'tofu', 'edamame']
+}
+
+# Words common on ingredient labels, used to tell a readable scan from OCR noise
+INGREDIENT_LEXICON = frozenset({
+    # Label vocabulary
+    'ingredients', 'ingredient', 'contains', 'contain', 'may', 'less', 'than',
+    'and', 'or', 'of', 'the', 'with', 'from', 'for', 'added', 'made', 'each',
+    'following', 'traces', 'allergen', 'allergens', 'allergy', 'advice',
+    'facility', 'processed', 'produced', 'organic', 'natural', 'artificial',
+    'flavour', 'flavor', 'flavours', 'flavors', 'flavoring', 'flavouring',
+    'color', 'colour', 'colors', 'colours', 'preservative', 'preservatives',
+    'emulsifier', 'emulsifiers', 'stabilizer', 'stabiliser', 'stabilizers',
+    'thickener', 'antioxidant', 'acidity', 'regulator', 'raising', 'agent',
+    'agents', 'sweetener', 'sweeteners', 'vitamin', 'vitamins', 'mineral',
+    'minerals', 'modified', 'hydrogenated', 'partially', 'enriched', 'refined',
+    'concentrate', 'extract', 'powder', 'dried', 'whole', 'skimmed', 'reduced',
+    'fat', 'fats', 'free', 'low', 'high', 'sodium', 'potassium', 'calcium',
+    'iron', 'zinc', 'magnesium', 'phosphate', 'carbonate', 'bicarbonate',
+    'chloride', 'citrate', 'sulfate', 'sulphate', 'lactate', 'acetate',
+    'benzoate', 'sorbate', 'sulfite', 'sulphite', 'nitrite', 'nitrate',
+    'glutamate', 'guanylate', 'inosinate', 'acid', 'citric', 'ascorbic',
+    'lactic', 'malic', 'acetic', 'tartaric', 'folic', 'niacin', 'thiamin',
+    'thiamine', 'riboflavin', 'mononitrate', 'pyridoxine', 'tocopherol',
+    'tocopherols', 'carotene', 'retinyl', 'palmitate', 'cholecalciferol',
+    # Foods
+    'water', 'salt', 'sugar', 'sugars', 'syrup', 'glucose', 'fructose',
+    'sucrose', 'dextrose', 'maltodextrin', 'lactose', 'honey', 'molasses',
+    'corn', 'maize', 'rice', 'oat', 'oats', 'barley', 'rye', 'wheat', 'flour',
+    'starch', 'gluten', 'bran', 'germ', 'malt', 'yeast', 'vinegar', 'oil',
+    'oils', 'vegetable', 'vegetables', 'palm', 'kernel', 'sunflower',
+    'rapeseed', 'canola', 'olive', 'coconut', 'soybean', 'cottonseed',
+    'butter', 'cream', 'milk', 'whey', 'casein', 'caseinate', 'cheese',
+    'yogurt', 'egg', 'eggs', 'albumin', 'cocoa', 'chocolate', 'vanilla',
+    'vanillin', 'cinnamon', 'pepper', 'paprika', 'garlic', 'onion', 'spice',
+    'spices', 'herbs', 'tomato', 'tomatoes', 'potato', 'potatoes', 'fruit',
+    'fruits', 'juice', 'apple', 'lemon', 'orange', 'strawberry', 'raisins',
+    'nuts', 'almond', 'almonds', 'peanut', 'peanuts', 'hazelnut', 'hazelnuts',
+    'cashew', 'walnut', 'pecan', 'pistachio', 'sesame', 'seeds', 'mustard',
+    'celery', 'soy', 'soya', 'lecithin', 'lecithins', 'protein', 'isolate',
+    'hydrolyzed', 'hydrolysed', 'gelatin', 'gelatine', 'pectin', 'agar',
+    'carrageenan', 'xanthan', 'guar', 'gum', 'gums', 'cellulose', 'glycerol',
+    'glycerin', 'sorbitol', 'xylitol', 'maltitol', 'erythritol', 'stevia',
+    'aspartame', 'sucralose', 'acesulfame', 'saccharin', 'caramel',
+    'mono', 'diglycerides', 'polysorbate', 'monosodium', 'disodium',
+    'trisodium', 'tbhq', 'bha', 'bht', 'edta', 'chicken', 'beef', 'pork',
+    'fish', 'tuna', 'salmon', 'shrimp', 'meat', 'broth', 'stock', 'cultures',
+    'enzymes', 'rennet', 'baking', 'soda', 'cornstarch', 'semolina', 'durum',
+})
+
+
+def lexicon_hit_rate(text: str) -> float:
+    """
+    Fraction of words in text that are known ingredient-label words
+
+    Args:
+        text: OCR or typed ingredient text
+
+    Returns:
+        Hit rate between 0 and 1 (0 when there are no words)
+    """
+    words = [word for word in re.findall(r'[a-z]+', text.lower()) if len(word) >= 3]
+    if not words:
+        return 0.0
+
+    hits = sum(1 for word in words if word in INGREDIENT_LEXICON or word.rstrip('s') in INGREDIENT_LEXICON)
+    return hits / len(words)
+
 
 def extract_ingredients(text: str) -> List[str]:
     """
@@ -127,18 +208,7 @@ def detect_allergens(ingredients: str) -> List[str]:
     ingredients_lower = ingredients.lower()
     allergens = []
 
-    allergen_keywords = {
-        'milk': ['milk', 'dairy', 'whey', 'casein', 'lactose', 'butter', 'cheese', 'cream'],
-        'eggs': ['egg', 'albumin', 'mayonnaise'],
-        'fish': ['fish', 'anchovy', 'bass', 'cod', 'salmon', 'tuna'],
-        'shellfish': ['shellfish', 'crab', 'lobster', 'shrimp', 'prawn'],
-        'tree nuts': ['almond', 'cashew', 'walnut', 'pecan', 'pistachio', 'hazelnut'],
-        'peanuts': ['peanut', 'groundnut'],
-        'wheat': ['wheat', 'flour', 'gluten'],
-        'soy': ['soy', 'soya', 'tofu', 'edamame']
-    }
-
-    for allergen, keywords in allergen_keywords.items():
+    for allergen, keywords in ALLERGEN_KEYWORDS.items():
         if any(keyword in ingredients_lower for keyword in keywords):
             allergens.append(allergen)
 
@@ -241,3 +311,169 @@ def merge_user_context(
             merged['confidence'] = new_conf
 
     return merged
+
+
+def build_rule_based_analysis(ingredients_text: str) -> Dict[str, Any]:
+    """
+    Build a basic analysis from local rules when the AI is unavailable
+
+    Args:
+        ingredients_text: Raw ingredient text
+
+    Returns:
+        Analysis dictionary with the same shape as an AI analysis
+    """
+    category_labels = {
+        'preservative': 'Concerning',
+        'coloring': 'Concerning',
+        'flavor_enhancer': 'Concerning',
+        'sweetener': 'Concerning',
+        'emulsifier': 'Neutral',
+        'acid': 'Neutral',
+        'other': 'Unknown'
+    }
+
+    ingredients = extract_ingredients(ingredients_text)
+    allergens = detect_allergens(ingredients_text)
+    processing_level = estimate_processing_level(ingredients)
+
+    ingredient_entries = []
+    for ingredient in ingredients:
+        category = categorize_ingredient(ingredient)
+        ingredient_entries.append({
+            "name": ingredient,
+            "category": category_labels[category],
+            "explanation": f"Detected as {category.replace('_', ' ')} by keyword rules.",
+            "tradeoffs": "",
+            "uncertainty": "Rule-based classification without AI review",
+            "relevantTo": ["allergy"] if detect_allergens(ingredient) else [],
+            "alternatives": None
+        })
+
+    key_insights = []
+    if allergens:
+        key_insights.append({
+            "insight": f"Contains common allergens: {', '.join(allergens)}",
+            "explanation": "Check this against your own allergies before buying.",
+            "uncertaintyLevel": "medium",
+            "reasoning": "Matched allergen keywords in the ingredient list",
+            "tradeoff": "Keyword matching can miss derivatives or flag harmless mentions"
+        })
+    key_insights.append({
+        "insight": f"Processing level looks {processing_level.replace('_', ' ')}",
+        "explanation": f"Based on {len(ingredients)} ingredients and how many look processed.",
+        "uncertaintyLevel": "high",
+        "reasoning": "Counted additives and processed-ingredient keywords",
+        "tradeoff": "A quick estimate, not a nutritional assessment"
+    })
+
+    return {
+        "summary": (
+            "Our AI analysis is temporarily unavailable, so this is a quick rule-based check "
+            "of allergens and additives. Try again shortly for a full analysis."
+        ),
+        "keyInsights": key_insights,
+        "ingredients": ingredient_entries,
+        "inferredConcerns": allergens,
+        "recommendedQuestions": [],
+        "proactiveSuggestions": [],
+        "aiQuestions": [],
+        "overallAssessment": {
+            "verdict": "Limited analysis - review the allergen and additive flags",
+            "bestFor": "Quick allergen screening",
+            "notIdealFor": "Detailed health decisions",
+            "betterAlternative": None
+        }
+    }
+
+
+def normalize_message(message: str) -> str:
+    """
+    Normalize a chat message for cache lookups
+
+    Args:
+        message: User message
+
+    Returns:
+        Lowercased message with collapsed whitespace and no trailing punctuation
+    """
+    normalized = re.sub(r'\s+', ' ', message.lower()).strip()
+    return normalized.rstrip('.!?… ')
+
+
+def context_hash(context: Optional[Dict[str, Any]]) -> str:
+    """
+    Hash user context independent of key and list order
+
+    Args:
+        context: User context dictionary
+
+    Returns:
+        Hex digest identifying the context
+    """
+    if not context:
+        return ''
+
+    canonical = {
+        key: sorted(value, key=str) if isinstance(value, list) else value
+        for key, value in context.items()
+    }
+    return hashlib.md5(orjson.dumps(canonical, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def project_analysis(
+    analysis: Dict[str, Any],
+    question: str,
+    max_ingredients: int = 5
+) -> Dict[str, Any]:
+    """
+    Reduce an analysis to the parts relevant to a follow-up question
+
+    Args:
+        analysis: Full analysis dictionary
+        question: User question
+        max_ingredients: Maximum detailed ingredient entries to include
+
+    Returns:
+        Compact analysis with the summary, verdict, detailed entries for
+        ingredients the question mentions and names/categories for the rest
+    """
+    question_words = set(re.findall(r'[a-z0-9]+', question.lower()))
+    # analysisContext comes from the client, so skip entries of the wrong shape
+    ingredients = analysis.get('ingredients')
+    ingredients = [entry for entry in ingredients if isinstance(entry, dict)] if isinstance(ingredients, list) else []
+    assessment = analysis.get('overallAssessment')
+
+    matching = []
+    for entry in ingredients:
+        name_words = set(re.findall(r'[a-z0-9]+', str(entry.get('name', '')).lower()))
+        if name_words & question_words:
+            matching.append(entry)
+
+    # Mentioned ingredients past the detail limit still get a name/category line
+    detailed = matching[:max_ingredients]
+    detailed_ids = {id(entry) for entry in detailed}
+
+    detail_fields = ('name', 'category', 'explanation', 'tradeoffs', 'uncertainty', 'alternatives')
+    projection = {
+        'summary': analysis.get('summary', ''),
+        'verdict': assessment.get('verdict', '') if isinstance(assessment, dict) else '',
+        'ingredients': [
+            {field: entry[field] for field in detail_fields if entry.get(field)}
+            for entry in detailed
+        ],
+        'otherIngredients': [
+            f"{entry.get('name', '')} ({entry.get('category', 'Unknown')})"
+            for entry in ingredients if id(entry) not in detailed_ids
+        ]
+    }
+
+    if not matching:
+        insights = analysis.get('keyInsights')
+        projection['keyInsights'] = [
+            insight.get('insight', '') for insight in (insights if isinstance(insights, list) else [])[:3]
+            if isinstance(insight, dict)
+        ]
+        projection['inferredConcerns'] = analysis.get('inferredConcerns', [])
+
+    return projection
@@ -0,0 +1,240 @@
+"""
+Job Queue
+Bounded async worker pool for slow analyses, with polling and webhooks
+"""
+
+import asyncio
+import ipaddress
+import secrets
+import socket
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import orjson
+
+from config.settings import settings
+from .cache import SimpleCache
+from .metrics import metrics
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+class CallbackRejectedError(Exception):
+    """Raised when a callback host resolves to a non-public address"""
+
+
+class JobQueue:
+    """
+    In-memory job queue drained by a fixed pool of worker tasks
+
+    The number of concurrent upstream calls is bounded by the worker count,
+    however many clients are waiting. Job records are kept in a cache until
+    their TTL expires, so results can be polled after completion.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int,
+        result_ttl_seconds: int,
+        callback_timeout: float
+    ):
+        """
+        Initialize queue
+
+        Args:
+            workers: Number of worker tasks
+            max_pending: Maximum queued jobs before submissions are rejected
+            result_ttl_seconds: How long job records are kept
+            callback_timeout: Timeout in seconds for webhook deliveries
+        """
+        self.worker_count = workers
+        self.max_pending = max_pending
+        self.callback_timeout = callback_timeout
+        self.store = SimpleCache(ttl_seconds=result_ttl_seconds)
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop, if not already running"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self.workers:
+            return
+
+        self._loop = loop
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(self.worker_count)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def submit(
+        self,
+        run: Callable[[], Awaitable[Dict[str, Any]]],
+        callback_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Queue a job
+
+        Args:
+            run: Coroutine factory producing the job result
+            callback_url: URL to POST the finished job record to
+
+        Returns:
+            The queued job record
+
+        Raises:
+            JobQueueFullError: If max_pending jobs are already queued
+        """
+        self.start()
+
+        job = {
+            "jobId": secrets.token_urlsafe(16),
+            "status": self.QUEUED,
+            "createdAt": datetime.now().isoformat(),
+            "completedAt": None,
+            "result": None,
+            "error": None
+        }
+
+        try:
+            self.queue.put_nowait((job["jobId"], run, callback_url))
+        except asyncio.QueueFull:
+            metrics.increment("jobs.rejected")
+            raise JobQueueFullError("Job queue is full")
+
+        self.store.set(job["jobId"], job)
+        metrics.increment("jobs.submitted")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job record by ID"""
+        return self.store.get(job_id)
+
+    def stats(self) -> dict:
+        """Get queue statistics"""
+        return {
+            "workers": len(self.workers),
+            "pending": self.queue.qsize() if self.queue else 0,
+            "max_pending": self.max_pending
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, run, callback_url = await self.queue.get()
+            try:
+                await self._run(job_id, run, callback_url)
+            finally:
+                self.queue.task_done()
+
+    async def _run(
+        self,
+        job_id: str,
+        run: Callable[[], Awaitable[Dict[str, Any]]],
+        callback_url: Optional[str]
+    ) -> None:
+        job = self.store.get(job_id)
+        if job is None:
+            return
+
+        job["status"] = self.RUNNING
+        self.store.set(job_id, job)
+
+        try:
+            job["result"] = await run()
+            job["status"] = self.COMPLETED
+            metrics.increment("jobs.completed")
+        except Exception as e:
+            # HTTPExceptions raised by the analysis carry a client-facing detail
+            job["error"] = getattr(e, "detail", None) or str(e)
+            job["status"] = self.FAILED
+            metrics.increment("jobs.failed")
+            print(f"❌ Job {job_id} failed: {str(e)}")
+
+        job["completedAt"] = datetime.now().isoformat()
+        self.store.set(job_id, job)
+
+        if callback_url:
+            delivered, status = await self._send_callback(callback_url, job)
+            job["callback"] = {"delivered": delivered, "status": status}
+            self.store.set(job_id, job)
+
+    async def _resolve_public_address(self, host: str, port: int) -> str:
+        """
+        Resolve a callback host, requiring every address to be globally routable
+
+        Raises:
+            CallbackRejectedError: If any address is loopback, private,
+                link-local or otherwise non-public
+            OSError: If the host does not resolve
+        """
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = [info[4][0] for info in infos]
+        if not addresses:
+            raise OSError(f"{host} did not resolve")
+
+        for address in addresses:
+            if not ipaddress.ip_address(address.split("%")[0]).is_global:
+                raise CallbackRejectedError(f"{host} resolves to non-public address {address}")
+        return addresses[0]
+
+    async def _send_callback(self, url: str, job: Dict[str, Any]) -> Tuple[bool, Optional[int]]:
+        """
+        POST a finished job record to its callback URL
+
+        The host is resolved and checked here, at delivery time, and the
+        connection is pinned to the checked address so DNS cannot be
+        switched to an internal address in between. Redirects are not
+        followed.
+        """
+        try:
+            target = httpx.URL(url)
+            port = target.port or (443 if target.scheme == "https" else 80)
+            address = await self._resolve_public_address(target.host, port)
+
+            async with httpx.AsyncClient(timeout=self.callback_timeout, follow_redirects=False) as client:
+                response = await client.post(
+                    target.copy_with(host=address),
+                    content=orjson.dumps(job),
+                    headers={"Content-Type": "application/json", "Host": target.netloc.decode("ascii")},
+                    # TLS still verifies the certificate against the original hostname
+                    extensions={"sni_hostname": target.host} if target.scheme == "https" else {}
+                )
+            delivered = 200 <= response.status_code < 300
+            status = response.status_code
+        except CallbackRejectedError as e:
+            print(f"⚠️  Job callback rejected: {str(e)}")
+            delivered, status = False, None
+        except (httpx.HTTPError, OSError) as e:
+            print(f"⚠️  Job callback failed: {str(e)}")
+            delivered, status = False, None
+
+        if not delivered:
+            metrics.increment("jobs.callback_failures")
+        return delivered, status
+
+
+# Global job queue
+job_queue = JobQueue(
+    workers=settings.JOB_WORKERS,
+    max_pending=settings.JOB_QUEUE_SIZE,
+    result_ttl_seconds=settings.JOB_RESULT_TTL_SECONDS,
+    callback_timeout=settings.JOB_CALLBACK_TIMEOUT
+)
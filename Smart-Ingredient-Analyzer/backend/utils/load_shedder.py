@@ -0,0 +1,171 @@
+"""
+Load Shedder
+Admission control from event-loop lag and in-flight Groq/OCR operations
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config.settings import settings
+from .metrics import metrics
+
+
+class LoadShedder:
+    """
+    Decide whether to admit new work based on current load
+
+    Load is measured two ways: how late the event loop wakes a periodic
+    probe (lag), and how many Groq/OCR operations are in flight. Low
+    priority work is shed at a fraction of the limits so that normal
+    requests keep completing; critical work is never shed.
+    """
+
+    LOW = "low"
+    NORMAL = "normal"
+    CRITICAL = "critical"
+
+    PROBE_INTERVAL = 0.1
+
+    def __init__(
+        self,
+        max_lag_ms: float,
+        max_in_flight: int,
+        low_priority_fraction: float,
+        retry_after_seconds: int,
+        enabled: bool = True
+    ):
+        """
+        Initialize shedder
+
+        Args:
+            max_lag_ms: Event-loop lag at which normal work is shed
+            max_in_flight: In-flight operations at which normal work is shed
+            low_priority_fraction: Fraction of both limits at which low
+                priority work is shed
+            retry_after_seconds: Retry-After value sent with 503s
+            enabled: Whether shedding is active at all
+        """
+        self.max_lag = max_lag_ms / 1000
+        self.max_in_flight = max_in_flight
+        self.low_priority_fraction = low_priority_fraction
+        self.retry_after_seconds = retry_after_seconds
+        self.enabled = enabled
+
+        self.lag = 0.0
+        self.in_flight = 0
+        self._lock = threading.Lock()  # OCR runs in worker threads
+        self._monitor: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the lag probe on the running event loop, if not already running"""
+        if self._monitor is None or self._monitor.done() or self._monitor.get_loop() is not asyncio.get_running_loop():
+            self._monitor = asyncio.create_task(self._probe_lag())
+
+    def stop(self) -> None:
+        """Stop the lag probe"""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+
+    async def _probe_lag(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.PROBE_INTERVAL)
+            sample = max(time.monotonic() - started - self.PROBE_INTERVAL, 0.0)
+            # Rise immediately, decay gradually so one quiet tick doesn't reopen the gate
+            self.lag = max(sample, self.lag * 0.5)
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Count an operation as in flight for the duration of the block"""
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def should_shed(self, priority: str) -> bool:
+        """
+        Check whether work of a priority should be rejected now
+
+        Args:
+            priority: LOW, NORMAL or CRITICAL
+
+        Returns:
+            True if the work should be shed
+        """
+        if not self.enabled or priority == self.CRITICAL:
+            return False
+
+        fraction = self.low_priority_fraction if priority == self.LOW else 1.0
+        if self.lag > self.max_lag * fraction or self.in_flight >= self.max_in_flight * fraction:
+            metrics.increment(f"shed.{priority}")
+            return True
+
+        return False
+
+    def stats(self) -> dict:
+        """Get current load"""
+        return {
+            "lag_ms": round(self.lag * 1000, 1),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight
+        }
+
+
+def overloaded_body() -> Dict[str, Dict[str, str]]:
+    """Error body for shed requests, in the shape of the HTTPException handler"""
+    return {
+        "error": {
+            "code": "OVERLOADED",
+            "message": "The server is busy. Please try again shortly."
+        }
+    }
+
+
+class LoadSheddingMiddleware:
+    """
+    Reject requests to low-priority paths with a fast 503 under load
+
+    Only paths listed in `priorities` are checked here. Endpoints whose
+    priority depends on the request body or on a cache hit check the
+    shedder themselves once they know.
+    """
+
+    def __init__(self, app: ASGIApp, shedder: "LoadShedder", priorities: Dict[str, str]):
+        self.app = app
+        self.shedder = shedder
+        self.priorities = priorities
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            self.shedder.start()
+            priority = self.priorities.get(scope["path"])
+            if priority and scope["method"] != "OPTIONS" and self.shedder.should_shed(priority):
+                response = ORJSONResponse(
+                    overloaded_body(),
+                    status_code=503,
+                    headers={"Retry-After": str(self.shedder.retry_after_seconds)}
+                )
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+
+# Global load shedder
+load_shedder = LoadShedder(
+    max_lag_ms=settings.SHED_MAX_LAG_MS,
+    max_in_flight=settings.SHED_MAX_IN_FLIGHT,
+    low_priority_fraction=settings.SHED_LOW_PRIORITY_FRACTION,
+    retry_after_seconds=settings.SHED_RETRY_AFTER_SECONDS,
+    enabled=settings.LOAD_SHEDDING_ENABLED
+)
@@ -0,0 +1,40 @@
+"""
+Metrics Utility
+Simple in-process counters for monitoring AI usage
+"""
+
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """In-memory counter registry"""
+
+    def __init__(self):
+        self.counters: Dict[str, float] = defaultdict(float)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        Increment a counter
+
+        Args:
+            name: Counter name
+            value: Amount to add (default 1)
+        """
+        self.counters[name] += value
+
+    def get(self, name: str) -> float:
+        """Get current counter value"""
+        return self.counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        """Get a copy of all counters"""
+        return dict(self.counters)
+
+    def reset(self) -> None:
+        """Reset all counters"""
+        self.counters.clear()
+
+
+# Global metrics instance
+metrics = Metrics()
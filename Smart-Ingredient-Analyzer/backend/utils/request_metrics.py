@@ -0,0 +1,89 @@
+"""
+Request Metrics
+Request IDs, timing headers and request counters as pure ASGI middleware
+"""
+
+import re
+import secrets
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import Metrics, metrics as default_metrics
+
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Client-supplied IDs are echoed back, so only accept short, header-safe ones
+_VALID_REQUEST_ID = re.compile(rb'^[A-Za-z0-9._:\-]{1,128}$')
+
+
+class RequestMetricsMiddleware:
+    """
+    Tag, time and count every HTTP request
+
+    Each request gets an ID (the client's X-Request-ID if valid, otherwise
+    a new one) available as `request.state.request_id` and echoed in the
+    response. X-Process-Time is the time to the response headers, in
+    seconds. Status classes and total duration are counted once the
+    response body completes.
+
+    Implemented as plain ASGI rather than `@app.middleware("http")`, which
+    runs each request in an extra task and re-streams the response body;
+    here messages pass straight through, so streamed responses are not
+    buffered.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: Optional[Metrics] = None):
+        self.app = app
+        self.metrics = metrics or default_metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        request_id = self._request_id(scope)
+        scope.setdefault("state", {})["request_id"] = request_id
+        status_code = 500
+        recorded = False
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status_code, recorded
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                headers.append((b"x-process-time", str(time.perf_counter() - start_time).encode("latin-1")))
+                message["headers"] = headers
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                recorded = True
+                self._record(status_code, start_time)
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        except Exception:
+            # Errors raised after the response completed (e.g. in background tasks) are not recounted
+            if not recorded:
+                self._record(500, start_time)
+            raise
+
+    def _request_id(self, scope: Scope) -> str:
+        """Use the client's request ID if it is valid, otherwise generate one"""
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                if _VALID_REQUEST_ID.match(value):
+                    return value.decode("latin-1")
+                break
+        return secrets.token_hex(8)
+
+    def _record(self, status_code: int, start_time: float) -> None:
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        self.metrics.increment("http.requests")
+        self.metrics.increment(f"http.responses.{status_code // 100}xx")
+        self.metrics.increment("http.duration_ms", elapsed_ms)
@@ -0,0 +1,224 @@
+"""
+Session Store
+Server-side user context and conversation state keyed by session ID
+"""
+
+import os
+import re
+import secrets
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import orjson
+
+from config.settings import settings
+from .cache import SimpleCache
+from .helpers import merge_user_context, context_hash
+
+
+class SessionBackend(ABC):
+    """Storage interface for session records"""
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Load a session record, or None if missing or expired"""
+
+    @abstractmethod
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        """Save a session record"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Delete a session record"""
+
+    @abstractmethod
+    def cleanup_expired(self) -> int:
+        """Delete expired session records, returning how many were removed"""
+
+
+class InMemorySessionBackend(SessionBackend):
+    """Keeps sessions in a per-process cache"""
+
+    def __init__(self, ttl_seconds: int):
+        self.cache = SimpleCache(ttl_seconds=ttl_seconds)
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.cache.get(session_id)
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        self.cache.set(session_id, data)
+
+    def delete(self, session_id: str) -> None:
+        self.cache.cache.pop(self.cache.key_for(session_id), None)
+
+    def cleanup_expired(self) -> int:
+        return self.cache.cleanup_expired()
+
+
+class FileSessionBackend(SessionBackend):
+    """Persists sessions as JSON files so they survive restarts and are shared across workers"""
+
+    def __init__(self, directory: str, ttl_seconds: int):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        path = self._path(session_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        path = self._path(session_id)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(orjson.dumps(data))
+        os.replace(temp_path, path)
+
+    def delete(self, session_id: str) -> None:
+        try:
+            os.remove(self._path(session_id))
+        except OSError:
+            pass
+
+    def cleanup_expired(self) -> int:
+        # Also removes temporary files left behind by an interrupted save
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return 0
+
+        for entry in entries:
+            if not entry.name.endswith((".json", ".json.tmp")):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+class SessionStore:
+    """
+    Session state shared across requests
+
+    Each session holds the merged user context, its precomputed hash and
+    the conversation memory record, so clients only send deltas.
+    """
+
+    _ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+    def __init__(self, backend: SessionBackend):
+        self.backend = backend
+
+    def create(self) -> Dict[str, Any]:
+        """Create and save a new empty session"""
+        session = {
+            "id": secrets.token_urlsafe(24),
+            "userContext": {},
+            "contextHash": "",
+            "memory": None
+        }
+        self.save(session)
+        return session
+
+    def get(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Load a session by ID, rejecting malformed IDs"""
+        if not session_id or not self._ID_PATTERN.match(session_id):
+            return None
+        return self.backend.load(session_id)
+
+    def save(self, session: Dict[str, Any]) -> None:
+        """Save a session and refresh its TTL"""
+        self.backend.save(session["id"], session)
+
+    def delete(self, session_id: str) -> None:
+        """Delete a session"""
+        if self._ID_PATTERN.match(session_id):
+            self.backend.delete(session_id)
+
+    def cleanup_expired(self) -> int:
+        """
+        Delete expired sessions
+
+        Backends only drop an expired session when it is read again, so
+        abandoned sessions are removed by calling this periodically.
+
+        Returns:
+            Number of sessions removed
+        """
+        return self.backend.cleanup_expired()
+
+    def merge_context(self, session: Dict[str, Any], delta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Merge a context delta into a session and save it
+
+        The session is re-loaded before saving so fields written since the
+        caller read it (such as conversation memory recorded during the same
+        request) are not overwritten with a stale copy.
+
+        Args:
+            session: Session record, updated in place
+            delta: New context fields sent by the client or inferred
+
+        Returns:
+            Merged user context
+        """
+        if delta:
+            current = self.backend.load(session["id"])
+            if current is not None:
+                session.update(current)
+            session["userContext"] = merge_user_context(session["userContext"], delta)
+            session["contextHash"] = context_hash(session["userContext"])
+            if current is not None:
+                # Not re-created if the session was deleted meanwhile
+                self.save(session)
+        return session["userContext"]
+
+    def memory_records(self) -> "SessionMemoryRecords":
+        """Get a get/set view of the sessions' conversation memory records"""
+        return SessionMemoryRecords(self)
+
+
+class SessionMemoryRecords:
+    """Adapts a SessionStore to the get/set interface ConversationMemory expects"""
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self.store.get(session_id)
+        return session["memory"] if session else None
+
+    def set(self, session_id: str, record: Dict[str, Any]) -> None:
+        # Only sessions created through the store get memory; a client-chosen
+        # ID must not bring a session into existence
+        session = self.store.get(session_id)
+        if session is None:
+            return
+        session["memory"] = record
+        self.store.save(session)
+
+
+def _create_backend() -> SessionBackend:
+    if settings.SESSION_BACKEND == "file":
+        return FileSessionBackend(settings.SESSION_FILE_DIR, settings.SESSION_TTL_SECONDS)
+    return InMemorySessionBackend(settings.SESSION_TTL_SECONDS)
+
+
+# Global session store
+session_store = SessionStore(_create_backend())
@@ -0,0 +1,151 @@
+"""
+Uploads
+Size-capped streaming of request bodies into spooled temporary files
+"""
+
+from tempfile import SpooledTemporaryFile
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import metrics
+
+try:
+    import multipart
+    from multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # pragma: nocover
+    multipart = None
+
+
+def upload_too_large(max_bytes: int) -> HTTPException:
+    """Structured 413 for bodies over the upload cap"""
+    metrics.increment("uploads.rejected_too_large")
+    return HTTPException(status_code=413, detail={
+        "code": "UPLOAD_TOO_LARGE",
+        "message": f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit. Please send a smaller image."
+    })
+
+
+async def spool_request_body(request: Request, max_bytes: int, spool_bytes: int) -> SpooledTemporaryFile:
+    """
+    Stream a request body into a spooled temporary file
+
+    The body is never held in memory as a whole: it is written chunk by
+    chunk, and spills to disk once it grows past `spool_bytes`.
+
+    Args:
+        request: Incoming request
+        max_bytes: Maximum body size, enforced while streaming
+        spool_bytes: Size kept in memory before spilling to disk
+
+    Returns:
+        Spooled file positioned at the start of the body; the caller closes it
+
+    Raises:
+        HTTPException: 413 as soon as the body exceeds max_bytes
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise upload_too_large(max_bytes)
+
+    spool = SpooledTemporaryFile(max_size=spool_bytes)
+    size = 0
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_bytes:
+                raise upload_too_large(max_bytes)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return spool
+
+
+class PartSizeLimiter:
+    """
+    Track the size of each part of a multipart body as it streams past
+
+    Raises a 413 as soon as any single part grows over `max_bytes`, so a
+    per-file cap holds even when the whole body is within its total cap.
+    """
+
+    def __init__(self, boundary: bytes, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.part_bytes = 0
+        self.parser = multipart.MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data
+        })
+
+    @classmethod
+    def for_headers(cls, headers: Headers, max_bytes: int) -> Optional["PartSizeLimiter"]:
+        """Create a limiter for a multipart/form-data request, None for other bodies"""
+        if multipart is None:
+            return None
+        content_type, params = parse_options_header(headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            return None
+        return cls(params[b"boundary"], max_bytes)
+
+    def feed(self, chunk: bytes) -> None:
+        self.parser.write(chunk)
+
+    def _on_part_begin(self) -> None:
+        self.part_bytes = 0
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self.part_bytes += end - start
+        if self.part_bytes > self.max_bytes:
+            raise upload_too_large(self.max_bytes)
+
+
+class UploadLimitMiddleware:
+    """
+    Cap request body sizes per path while the body is being received
+
+    Bodies declaring a Content-Length over the limit are rejected before
+    anything is read; others are cut off with a 413 as soon as they cross
+    it, so oversized multipart or JSON uploads are never fully buffered.
+    Paths in `part_limits` also cap each part of a multipart body.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int], part_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.limits = limits
+        self.part_limits = part_limits or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        max_bytes: Optional[int] = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        declared = headers.get("content-length", "")
+        received = 0
+
+        max_part_bytes = self.part_limits.get(scope["path"])
+        part_limiter = PartSizeLimiter.for_headers(headers, max_part_bytes) if max_part_bytes else None
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            # Raised inside the app, so its HTTPException handler shapes the 413
+            if declared.isdigit() and int(declared) > max_bytes:
+                raise upload_too_large(max_bytes)
+
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                received += len(body)
+                if received > max_bytes:
+                    raise upload_too_large(max_bytes)
+                if part_limiter is not None:
+                    part_limiter.feed(body)
+            return message
+
+        await self.app(scope, receive_limited, send)
@@ -4,7 +4,10 @@ Validation functions for API requests
 """
 
 from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+import ipaddress
 import re
+import socket
 
 
 def validate_ingredients(ingredients: str) -> tuple[bool, Optional[str]]:
@@ -156,3 +159,43 @@ def validate_comparison_request(
         return False, f"Product 2: {error}"
 
     return True, None
+
+
+def validate_callback_url(url: str) -> tuple[bool, Optional[str]]:
+    """
+    Validate a job callback URL
+
+    Rejects non-HTTP schemes and hosts that are literally on loopback or
+    private networks (including shorthand IPv4 forms like 127.1). Hostnames
+    are resolved and checked again when the callback is delivered.
+
+    Args:
+        url: Callback URL
+
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    if len(url) > 2000:
+        return False, "Callback URL too long (maximum 2000 characters)"
+
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return False, "Callback URL must be an http(s) URL"
+
+    host = parsed.hostname.lower()
+    if host == 'localhost' or host.endswith('.localhost') or host.endswith('.internal'):
+        return False, "Callback URL must be publicly reachable"
+
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        try:
+            # Numeric hosts the resolver accepts: 127.1, 2130706433, 0x7f000001
+            address = ipaddress.ip_address(socket.inet_aton(host))
+        except OSError:
+            return True, None
+
+    if not address.is_global:
+        return False, "Callback URL must be publicly reachable"
+
+    return True, None